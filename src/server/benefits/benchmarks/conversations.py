@@ -0,0 +1,137 @@
+"""
+AgentMemory under thousands of concurrent simulated players.
+
+    python src/server/benefits/benchmarks/conversations.py [--players 5000] [--turns 100] [--threads 16]
+
+Each turn does what StoryAgent.scene_response does with memory: read the
+player's history, take the last 12 messages for the prompt, and store the
+user/assistant pair. Players take their turns interleaved at random across
+--threads threads. Prints one JSON line per store:
+
+    {"store", "players", "turns", "threads", "wall_s", "turns_per_s", "p50_us", "p99_us",
+     "peak_traced_bytes", "stats"}
+
+Stores: "memory" (InMemoryStore), "sqlite" (SqliteStore on a temporary
+file) and "copying", the store AgentMemory replaced (history copied on every
+read and write), for comparison. --ttl and --max-bytes exercise eviction;
+peak_traced_bytes is only measured with --trace-memory, which slows every
+store down.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import tracemalloc
+import statistics
+import concurrent.futures
+
+BENEFITS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BENEFITS_DIR)
+
+from storyagent import AgentMemory
+from conversation_store import InMemoryStore, SqliteStore
+from log import configure_logging
+
+
+class CopyingMemory:
+    """The store AgentMemory replaced: unbounded, copies the history on every get and append."""
+
+    def __init__(self):
+        self._convos = {}
+        self._lock = threading.Lock()
+
+    def get(self, player_id):
+        with self._lock:
+            return self._convos.get(player_id, []).copy()
+
+    def set(self, player_id, history):
+        with self._lock:
+            self._convos[player_id] = history
+
+    def stats(self):
+        return {"players": len(self._convos), "messages": sum(map(len, self._convos.values()))}
+
+
+def play_turn(memory, player_id, turn, bounded):
+    history = memory.get(player_id)
+    prompt = history[-12:]  # What scene_response sends along
+    user = {"role": "user", "content": f"Turn {turn}: what does my plan cover for physiotherapy this year?"}
+    reply = {"role": "assistant", "content": "Your plan covers physiotherapy up to the annual maximum. " * 3}
+    if bounded:
+        memory.extend(player_id, (user, reply))
+    else:
+        memory.set(player_id, history + [user, reply])
+    return len(prompt)
+
+
+def run(name, memory, players, turns, threads, seed, trace_memory):
+    schedule = [f"player-{p}" for p in range(players) for _ in range(turns)]
+    random.Random(seed).shuffle(schedule)
+    chunks = [schedule[i::threads] for i in range(threads)]
+    bounded = isinstance(memory, AgentMemory)
+
+    def drive(chunk):
+        latencies = []
+        for turn, player_id in enumerate(chunk):
+            started = time.perf_counter()
+            play_turn(memory, player_id, turn, bounded)
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = [latency for chunk in executor.map(drive, chunks) for latency in chunk]
+    wall = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {"store": name, "players": players, "turns": len(schedule), "threads": threads,
+            "wall_s": round(wall, 3), "turns_per_s": round(len(schedule) / wall),
+            "p50_us": round(statistics.median(latencies) * 1e6, 1),
+            "p99_us": round(latencies[int(len(latencies) * 0.99)] * 1e6, 1),
+            "peak_traced_bytes": peak, "stats": memory.stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=5000)
+    parser.add_argument("--turns", type=int, default=100)  # Per player
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--max-messages", type=int, default=100)
+    parser.add_argument("--max-bytes", type=int)  # Store-wide ceiling; unlimited when omitted
+    parser.add_argument("--ttl", type=float)  # Idle seconds before a player is dropped; never when omitted
+    parser.add_argument("--stores", nargs="+", default=["memory", "sqlite", "copying"])
+    parser.add_argument("--trace-memory", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    configure_logging()
+
+    db_dir = tempfile.mkdtemp()
+    try:
+        for name in args.stores:
+            if name == "memory":
+                memory = AgentMemory(InMemoryStore(max_messages=args.max_messages, ttl=args.ttl, max_bytes=args.max_bytes))
+            elif name == "sqlite":
+                memory = AgentMemory(SqliteStore(os.path.join(db_dir, "conversations.db"),
+                                                 max_messages=args.max_messages, ttl=args.ttl))
+            else:
+                memory = CopyingMemory()
+            result = run(name, memory, args.players, args.turns, args.threads, args.seed, args.trace_memory)
+            if name == "sqlite":
+                memory.store.close()
+            print(json.dumps(result))
+    finally:
+        shutil.rmtree(db_dir)
+
+
+if __name__ == "__main__":
+    main()
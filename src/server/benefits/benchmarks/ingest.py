@@ -0,0 +1,205 @@
+"""
+Stage-by-stage ingest benchmark over the bundled sample booklets.
+
+    python src/server/benefits/benchmarks/ingest.py [--pdfs ...] [--scales 10 100] [--output results.jsonl]
+
+Runs every ingest stage against each sample PDF, and against synthetic
+booklets made by repeating --synthetic-source 10x and 100x, and prints one
+JSON line per (booklet, stage):
+
+    {"booklet", "scale", "pages", "stage", "wall_s", "peak_rss_bytes", "get_text_calls", "commit"}
+
+peak_rss_bytes is the process high-water mark reached during the stage; on
+Linux it is reset before each stage, elsewhere it only ever grows. The LLM is
+replaced by a deterministic in-process stub, so the run is offline and
+repeatable; --replay serves recorded responses instead, optionally with
+synthetic latency. Compare two commits by diffing their output files.
+"""
+import os
+import re
+import sys
+import io
+import json
+import time
+import types
+import shutil
+import asyncio
+import argparse
+import resource
+import tempfile
+import platform
+import contextlib
+import subprocess
+
+BENEFITS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BENEFITS_DIR)
+
+import fitz
+import utils
+import llm_transport
+import booklet
+from booklet import BenefitsBooklet
+from log import configure_logging
+
+
+class StubTransport:
+    """Deterministic stand-in LLM transport: summaries derived from the prompt alone."""
+
+    available = True
+
+    def __init__(self):
+        self.calls = 0
+
+    def complete(self, model, messages, temperature, **kwargs):
+        self.calls += 1
+        prompt = messages[0]["content"]
+        ids = re.findall(r'"id": "(\d+)"', prompt)
+        if ids:
+            content = json.dumps([{"id": i, "heading": f"Section {i}", "summary": "Stub summary.",
+                                   "classification": "Other", "key_entities": []} for i in ids])
+        else:
+            heading = re.search(r"under the heading: \[(.*?)\]", prompt)
+            content = json.dumps({"heading": heading.group(1) if heading else "Section", "summary": "Stub summary.",
+                                  "classification": "Other", "key_entities": []})
+        return llm_transport.response_from_dict({"content": content, "usage": {
+            "prompt_tokens": utils.estimate_tokens(prompt), "completion_tokens": utils.estimate_tokens(content)}})
+
+    async def acomplete(self, **request):
+        return self.complete(**request)
+
+
+GET_TEXT_CALLS = [0]
+
+def count_get_text():
+    """Count fitz get_text() calls made in this process (page decoding runs serially here)."""
+    get_text = fitz.Page.get_text
+
+    def counted(page, *args, **kwargs):
+        GET_TEXT_CALLS[0] += 1
+        return get_text(page, *args, **kwargs)
+
+    fitz.Page.get_text = counted
+
+
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")  # Resets VmHWM to the current RSS
+    except OSError:
+        pass
+
+def peak_rss():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if platform.system() == "Darwin" else maxrss * 1024
+
+
+def scaled_pdf(source, scale, directory):
+    """Write `source` repeated `scale` times into one PDF."""
+    path = os.path.join(directory, f"{os.path.splitext(os.path.basename(source))[0]} x{scale}.pdf")
+    with fitz.open(source) as src, fitz.open() as doc:
+        for _ in range(scale):
+            doc.insert_pdf(src)
+        doc.save(path)
+    return path
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENEFITS_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_booklet(pdf_path, scale, emit):
+    results_dir = tempfile.mkdtemp()
+    # Stages are driven one at a time below
+    book = BenefitsBooklet(pdf_path, results_dir, summarize=False, process=False)
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+
+    def stage(name, fn):
+        reset_peak_rss()
+        calls = GET_TEXT_CALLS[0]
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn()
+        wall = time.perf_counter() - started
+        emit({"booklet": os.path.basename(pdf_path), "scale": scale, "pages": page_count,
+              "stage": name, "wall_s": round(wall, 4), "peak_rss_bytes": peak_rss(),
+              "get_text_calls": GET_TEXT_CALLS[0] - calls})
+        return result
+
+    def set_mmap():
+        book.cache_format = "mmap"
+
+    try:
+        pages = stage("decode_pages", lambda: booklet.load_pages(pdf_path))
+        stage("get_page_width", lambda: booklet.get_page_width(pages))
+        stage("build_style_list", lambda: book.build_style_list(pages))
+        stage("detect_running_lines", lambda: booklet.detect_running_lines(pages))
+        del pages
+        stage("parse_pdf", book.parse_pdf)
+        stage("summarize_stub", lambda: asyncio.run(llm_transport.closing_clients(book.async_summarize())))
+        stage("reconstruct_hierarchy", book.reconstruct_hierarchy)
+        stage("save_json", book.save)
+        stage("load_json", book.load)
+        set_mmap()
+        stage("save_mmap", book.save)
+        stage("load_mmap", book.load)
+        shutil.rmtree(results_dir)
+        os.makedirs(results_dir)
+        stage("ingest_end_to_end", lambda: BenefitsBooklet(pdf_path, results_dir))
+    finally:
+        shutil.rmtree(results_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdfs", nargs="+",
+                        default=[os.path.join(BENEFITS_DIR, f"Sample Booklet{n}.pdf") for n in (1, 2, 3)])
+    parser.add_argument("--synthetic-source", default=os.path.join(BENEFITS_DIR, "Sample Booklet1.pdf"))
+    parser.add_argument("--scales", nargs="*", type=int, default=[10, 100])  # Synthetic sizes; none to skip
+    parser.add_argument("--replay")  # Recordings file (LLM_TRANSPORT=record) to replay instead of the stub
+    parser.add_argument("--replay-latency", type=float, default=0.0)  # Synthetic seconds per replayed call
+    parser.add_argument("--output")  # JSON-lines file; stdout when omitted
+    args = parser.parse_args()
+
+    configure_logging("WARNING")  # Progress messages would only add I/O to the timed stages
+    stub = StubTransport()
+    if args.replay:
+        llm_transport.set_transport(llm_transport.ReplayTransport(args.replay, latency=args.replay_latency))
+    else:
+        llm_transport.set_transport(stub)
+    count_get_text()
+    commit = current_commit()
+    out = open(args.output, "w") if args.output else sys.stdout
+
+    def emit(record):
+        record["commit"] = commit
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+
+    synthetic_dir = tempfile.mkdtemp()
+    try:
+        for pdf_path in args.pdfs:
+            bench_booklet(pdf_path, 1, emit)
+        for scale in args.scales:
+            bench_booklet(scaled_pdf(args.synthetic_source, scale, synthetic_dir), scale, emit)
+    finally:
+        shutil.rmtree(synthetic_dir)
+        if out is not sys.stdout:
+            out.close()
+    if not args.replay:
+        print(f"Stub LLM calls: {stub.calls}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Per-booklet resident footprint of BenefitsBooklet loaded from its cache.
+
+    python src/server/benefits/benchmarks/memory.py [--cache booklet_cache.json] [--copies 50]
+
+Loads the same cache `copies` times, the way the server keeps one booklet per
+employer resident, and reports traced bytes per booklet for each cache format:
+right after load, and after every section body has been read.
+"""
+import os
+import sys
+import io
+import json
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+
+BENEFITS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BENEFITS_DIR)
+
+from booklet import BenefitsBooklet
+from log import configure_logging
+
+
+def measure(results_dir, copies, cache_format):
+    kwargs = {"cache_format": cache_format} if cache_format != "json" else {}
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    with contextlib.redirect_stdout(io.StringIO()):
+        booklets = [BenefitsBooklet(pdf_path=None, results_dir=results_dir, **kwargs) for _ in range(copies)]
+    loaded = tracemalloc.take_snapshot()
+    for booklet in booklets:
+        for section in booklet.sections:
+            section.body
+    touched = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    def per_booklet(snapshot):
+        return sum(stat.size_diff for stat in snapshot.compare_to(before, "filename")) / copies
+
+    return {
+        "format": cache_format,
+        "sections": len(booklets[0].sections),
+        "bytes_per_booklet_loaded": round(per_booklet(loaded)),
+        "bytes_per_booklet_bodies_read": round(per_booklet(touched)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cache", default=os.path.join(BENEFITS_DIR, "booklet_cache.json"))
+    parser.add_argument("--copies", type=int, default=50)
+    parser.add_argument("--formats", nargs="+", default=["json", "mmap"])
+    args = parser.parse_args()
+    configure_logging()
+
+    results_dir = tempfile.mkdtemp()
+    try:
+        shutil.copy(args.cache, os.path.join(results_dir, "booklet_cache.json"))
+        if "mmap" in args.formats:
+            # Build the mapped cache once so its one-off migration is not measured
+            with contextlib.redirect_stdout(io.StringIO()):
+                BenefitsBooklet(pdf_path=None, results_dir=results_dir, cache_format="mmap")
+
+        for cache_format in args.formats:
+            print(json.dumps(measure(results_dir, args.copies, cache_format)))
+    finally:
+        shutil.rmtree(results_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Cold start of a cache-hit booklet.py invocation, as Node pays it per request.
+
+    python src/server/benefits/benchmarks/startup.py [--cache booklet_cache.json] [--runs 20]
+
+Times `booklet.py --pdf ... --out <dir>` in fresh interpreters against an
+existing cache and compares the median with a bare `python -c pass`. Also
+lists which heavy modules (PyMuPDF, the OpenAI SDK, httpx, tiktoken,
+dotenv) the cache-hit path imported; it should be none of them. Exits
+non-zero when the median overhead misses TARGET_OVERHEAD_S.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BENEFITS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOOKLET = os.path.join(BENEFITS_DIR, "booklet.py")
+
+TARGET_OVERHEAD_S = 0.1  # Median cache hit minus bare interpreter startup (was ~0.75s with eager imports)
+HEAVY_MODULES = ("fitz", "openai", "tiktoken", "dotenv", "httpx")
+
+PROBE = """
+import os, sys, runpy
+sys.argv = [sys.argv[1], "--pdf", "unused.pdf", "--out", sys.argv[2]]
+sys.path.insert(0, os.path.dirname(sys.argv[0]))  # As when the script is run directly
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+finally:
+    print(",".join(m for m in {heavy!r} if m in sys.modules), file=sys.__stderr__)
+"""
+
+
+def wall_times(command, runs):
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def heavy_imports(results_dir):
+    probe = subprocess.run([sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES), BOOKLET, results_dir],
+                           check=True, capture_output=True, text=True, env=dict(os.environ, BOOKLET_LOG_LEVEL="WARNING"))
+    last = probe.stderr.strip().splitlines()[-1] if probe.stderr.strip() else ""
+    return [m for m in last.split(",") if m]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cache", default=os.path.join(BENEFITS_DIR, "booklet_cache.json"))
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    results_dir = tempfile.mkdtemp()
+    try:
+        shutil.copy(args.cache, os.path.join(results_dir, "booklet_cache.json"))
+        command = [sys.executable, BOOKLET, "--pdf", "unused.pdf", "--out", results_dir]
+        subprocess.run(command, check=True, capture_output=True)  # Upgrades an old cache once, untimed
+        bare = statistics.median(wall_times([sys.executable, "-c", "pass"], args.runs))
+        times = wall_times(command, args.runs)
+        heavy = heavy_imports(results_dir)
+    finally:
+        shutil.rmtree(results_dir)
+
+    median = statistics.median(times)
+    result = {"runs": args.runs, "bare_s": round(bare, 4), "median_s": round(median, 4), "min_s": round(min(times), 4),
+              "overhead_s": round(median - bare, 4), "target_overhead_s": TARGET_OVERHEAD_S, "heavy_imports": heavy}
+    print(json.dumps(result))
+    if median - bare > TARGET_OVERHEAD_S or heavy:
+        sys.exit("Cold-start target missed")
+
+
+if __name__ == "__main__":
+    main()
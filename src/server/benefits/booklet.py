@@ -1,15 +1,73 @@
 import os
+import sys
 import argparse
 import json
-import fitz
-from dotenv import load_dotenv
-from typing import List, Dict, Any, Optional, Tuple
-from utils import callGPT, setup_results_directory, CUMULATIVE_TOKENS
+import mmap
+import struct
+import bisect
+import asyncio
+import hashlib
+import tempfile
+import contextlib
+import weakref
+import threading
+import time
+import logging
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Iterable
+from utils import (callGPT, acallGPT, RateLimiter, estimate_tokens, parse_json_output, token_scope,
+                   setup_results_directory, CUMULATIVE_TOKENS, TOKENS, TOKEN_LIMIT, TokenBudgetExceeded,
+                   MODEL_NAME, RATE_LIMIT_RPM, RATE_LIMIT_TPM)
+from telemetry import TELEMETRY, JsonLinesExporter
+from llm_transport import add_env_file, closing_clients
+from log import get_logger, configure_logging
 import concurrent.futures
-from collections import defaultdict
+import functools
+from collections import defaultdict, OrderedDict
 import math
 
+log = get_logger("booklet")
+
+EDGE_LINES = 5  # Lines compared at the top/bottom of each page for header/footer detection
+RUNNING_LINE_WINDOW = 3  # Max page gap inside a run of a repeated header/footer line
+RUNNING_LINE_SHARE = 0.3  # Edge lines on at least this share of pages run wherever they appear
+RUNNING_LINE_BAND = 4.0  # Points: repeats of a running line sit in the same band from the page edge
+ASCII_DIGITS = str.maketrans("", "", "0123456789")
+SPAN_FORMATTING_CACHE_SIZE = 65536  # Distinct (flags, span text, allcaps font) combinations memoized
+BREADCRUMB_SEPARATOR = ' -> '
+NEW_SECTION = object()  # Placeholder parent for sections inserted by update_sections
+UNLOADED = object()  # Field still sitting in a mapped cache file
+CACHE_WRITE_LOCKS: Dict[str, threading.Lock] = defaultdict(threading.Lock)  # Per cache file, for read-merge-write
+class StyleAttributes(dict):
+    """A section's style attributes: a plain dict that STYLE_TABLE can hold weakly."""
+    __slots__ = ("__weakref__",)
+
+STYLE_TABLE: "weakref.WeakValueDictionary[tuple, StyleAttributes]" = weakref.WeakValueDictionary()  # Styles in use
+
+def intern_attributes(attributes: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Return the shared dict equal to attributes without "page" (sections carry
+    their own), registering it if it is new. A style is dropped from the
+    table with the last section using it, e.g. when its booklet is evicted.
+    """
+    if attributes is None:
+        return None
+    style = {name: value for name, value in attributes.items() if name != "page"}
+    try:
+        key = tuple(sorted(style.items()))
+    except TypeError:  # Unhashable values: keep the caller's dict
+        return attributes
+    shared = STYLE_TABLE.get(key)
+    if shared is None:
+        shared = STYLE_TABLE.setdefault(key, StyleAttributes(style))
+    return shared
+
 class BookletSection:
+    # Many booklets stay resident per server process, so sections avoid a per-instance
+    # __dict__, share attribute dicts/labels through the intern tables, and (from a
+    # mapped cache) leave body and key_entities on disk until first access.
+    __slots__ = ("heading", "breadcrumb_heading", "_attributes", "_body", "sequence", "page",
+                 "summary", "_classification", "_key_entities", "_mapped", "_record")
+
     def __init__(self, heading: str, attributes: dict, body: str, sequence: int, page: int,
                  summary=None, classification=None, key_entities=None, breadcrumb_heading=None):
         self.heading = heading
@@ -21,8 +79,47 @@ class BookletSection:
         self.summary = summary
         self.classification = classification
         self.key_entities = key_entities
+        self._mapped = None  # MappedBookletCache holding body/key_entities, if loaded from one
+        self._record = None  # Record number in that cache
         #print(f"Page: {page} | {heading}")
 
+    @property
+    def attributes(self):
+        """Shared style dict: assign a new dict to re-style, never mutate in place."""
+        return self._attributes
+
+    @attributes.setter
+    def attributes(self, value):
+        self._attributes = intern_attributes(value)
+
+    @property
+    def classification(self):
+        return self._classification
+
+    @classification.setter
+    def classification(self, value):
+        self._classification = sys.intern(value) if isinstance(value, str) else value
+
+    @property
+    def body(self):
+        if self._body is UNLOADED:
+            self._body = self._mapped.read_field(self._record, "body")
+        return self._body
+
+    @body.setter
+    def body(self, value):
+        self._body = value
+
+    @property
+    def key_entities(self):
+        if self._key_entities is UNLOADED:
+            self._key_entities = self._mapped.read_field(self._record, "key_entities")
+        return self._key_entities
+
+    @key_entities.setter
+    def key_entities(self, value):
+        self._key_entities = value
+
     def to_dict(self):
         return {
             "heading": self.heading,
@@ -40,105 +137,553 @@ class BookletSection:
     def from_dict(cls, data):
         return cls(**data)
 
+    @classmethod
+    def from_mapped(cls, cache: "MappedBookletCache", record: int, fields: Dict[str, Any]):
+        """Build a section from a mapped cache header record; body and key_entities are read on first access."""
+        section = cls(body=UNLOADED, key_entities=UNLOADED, **fields)
+        section._mapped = cache
+        section._record = record
+        return section
+
     def __repr__(self):
         return f"BookletSection(heading='{self.heading}', breadcrumb_heading='{self.breadcrumb_heading}', body={self.body}, classification={self.classification}, sequence={self.sequence}, page={self.page})"
 
     def summarize(self):
         if self.summary is None:
             summary_data = summarize_text(self.heading, self.body)
-            self.heading = summary_data.get("heading", "")
-            self.summary = summary_data.get("summary", "")
-            self.classification = summary_data.get("classification", "")
-            self.key_entities = summary_data.get("key_entities", "")
+            self.apply_summary(summary_data)
         return self.summary
 
+    def apply_summary(self, summary_data: Dict[str, Any]) -> None:
+        self.heading = summary_data.get("heading", "")
+        self.summary = summary_data.get("summary", "")
+        self.classification = summary_data.get("classification", "")
+        self.key_entities = summary_data.get("key_entities", "")
+
+
+class SummaryCache:
+    """
+    Persistent, content-addressed store of summarize_text results.
+
+    Entries are keyed by a hash of (heading, body, prompt version, model), so a
+    section whose text is unchanged between booklets or plan years is never sent
+    to the LLM twice. The store is capped at max_entries with LRU eviction and
+    is written back to disk with save(), which merges in entries other ingests
+    saved to the same file meanwhile and swaps the result in atomically.
+    """
+
+    def __init__(self, filename: str, max_entries: int = 5000):
+        self.filename = filename
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        cached_data = load_cache(filename)
+        if cached_data:
+            self._entries.update(cached_data.get("entries", {}))
+
+    @staticmethod
+    def key(heading: str, body: str, prompt_version: str = None, model: str = MODEL_NAME) -> str:
+        payload = json.dumps([heading, body, prompt_version or SUMMARY_PROMPT_VERSION, model])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            summary_data = self._entries.get(key)
+            if summary_data is not None:
+                self._entries.move_to_end(key)  # Recency only; a read alone does not rewrite the file
+            return summary_data
+
+    def put(self, key: str, summary_data: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = summary_data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def save(self) -> None:
+        with self._lock, CACHE_WRITE_LOCKS[os.path.abspath(self.filename)]:
+            if not self._dirty:
+                return
+            on_disk = load_cache(self.filename) or {}
+            merged = OrderedDict(on_disk.get("entries", {}))
+            for key, summary_data in self._entries.items():  # Ours are the most recently used
+                merged[key] = summary_data
+                merged.move_to_end(key)
+            while len(merged) > self.max_entries:
+                merged.popitem(last=False)
+            save_cache({"entries": merged}, self.filename)
+            self._entries = merged
+            self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SummaryCheckpoint:
+    """
+    Append-only log of the summaries finished during one ingest, one JSON line
+    ({"key", "summary"}) per completed LLM request, flushed as it completes.
+    A restarted ingest replays it instead of calling the LLM again for those
+    sections. It is removed once the booklet cache has been saved.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._file = None
+
+        if os.path.exists(filename):
+            with open(filename, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Torn last line from an interrupted run
+                    self._entries[entry["key"]] = entry["summary"]
+            if self._entries:
+                log.info("Resuming from checkpoint: %d summaries already done.", len(self._entries))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(key)
+
+    def append(self, key: str, summary_data: Dict[str, Any]) -> None:
+        if self._file is None:
+            self._file = open(self.filename, 'a')
+        self._entries[key] = summary_data
+        self._file.write(json.dumps({"key": key, "summary": summary_data}) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self) -> None:
+        self.close()
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SectionIndex:
+    """
+    Trie over breadcrumb paths (heading -> heading -> ...). Each node keeps the
+    sections at that exact path (in document order) and its child nodes, so
+    ancestors, direct children and subtrees are found in O(depth) instead of
+    scanning every section.
+    """
+
+    def __init__(self, sections: List[BookletSection]):
+        self.root = {"sections": [], "children": {}}
+        for section in sections:
+            self.add(section)
+
+    def add(self, section: BookletSection) -> None:
+        if section.breadcrumb_heading is None:
+            return
+        node = self.root
+        for heading in section.breadcrumb_heading.split(BREADCRUMB_SEPARATOR):
+            node = node["children"].setdefault(heading, {"sections": [], "children": {}})
+        bisect.insort(node["sections"], section, key=document_order)
+
+    def remove(self, section: BookletSection, breadcrumb_heading: Optional[str] = None) -> None:
+        """Drop a section from the node at breadcrumb_heading (defaults to its current breadcrumb)."""
+        breadcrumb_heading = breadcrumb_heading or section.breadcrumb_heading
+        node = self.node(breadcrumb_heading) if breadcrumb_heading is not None else None
+        if node is not None:
+            node["sections"] = [s for s in node["sections"] if s is not section]
+
+    def node(self, breadcrumb_heading: str) -> Optional[Dict[str, Any]]:
+        node = self.root
+        for heading in breadcrumb_heading.split(BREADCRUMB_SEPARATOR):
+            node = node["children"].get(heading)
+            if node is None:
+                return None
+        return node
+
+    def find(self, breadcrumb_heading: str) -> Optional[BookletSection]:
+        node = self.node(breadcrumb_heading)
+        if node and node["sections"]:
+            return node["sections"][0]
+        return None
+
+    def ancestors(self, breadcrumb_heading: str) -> List[BookletSection]:
+        """Sections on the path to breadcrumb_heading, including the target itself."""
+        found = []
+        node = self.root
+        for heading in breadcrumb_heading.split(BREADCRUMB_SEPARATOR):
+            node = node["children"].get(heading)
+            if node is None:
+                return []
+            found.extend(node["sections"])
+        return sorted(found, key=document_order)
+
+    def children(self, breadcrumb_heading: str) -> List[BookletSection]:
+        node = self.node(breadcrumb_heading)
+        if node is None:
+            return []
+        found = [section for child in node["children"].values() for section in child["sections"]]
+        return sorted(found, key=document_order)
+
+    def subtree(self, breadcrumb_heading: str) -> List[BookletSection]:
+        """The target section(s) and every section nested below them."""
+        node = self.node(breadcrumb_heading)
+        if node is None:
+            return []
+        found, stack = [], [node]
+        while stack:
+            current = stack.pop()
+            found.extend(current["sections"])
+            stack.extend(current["children"].values())
+        return sorted(found, key=document_order)
+
+
+class StyleIndex:
+    """
+    Hash index over build_style_list() output, keyed on (size, formatting,
+    alignment, indentation). Indentation only matters for left-aligned text,
+    so non-left styles are also keyed without it. The first style per key wins,
+    which keeps the old linear scan's "most frequent match" result.
+    """
+
+    def __init__(self, style_list: List[Dict[str, Any]]):
+        self.exact = {}
+        self.unindented = {}
+        for style in style_list:
+            attributes = style["attributes"]
+            key = (attributes["size"], attributes["formatting"], attributes["alignment"])
+            self.exact.setdefault(key + (attributes["indentation"],), style)
+            self.unindented.setdefault(key, style)
+
+    def lookup(self, attributes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        key = (attributes["size"], attributes["formatting"], attributes["alignment"])
+        if attributes["alignment"] != "left":
+            return self.unindented.get(key)
+        return self.exact.get(key + (attributes["indentation"],))
+
+
 class BenefitsBooklet:
-    def __init__(self, pdf_path, results_dir):
+    def __init__(self, pdf_path, results_dir, workers=1, summarize=True, summary_cache_path=None,
+                 cache_format="json", token_budget=None, tenant=None, process=True):
         self.pdf_path = pdf_path
         self.results_dir = results_dir
+        self.cache_format = cache_format  # "json" (booklet_cache.json) or "mmap" (booklet_cache.bkc)
+        self.workers = workers  # Processes used to decode PDF pages (1 = serial)
+        self.summarize = summarize
+        # Point several booklets at one file to share summaries across carriers/plan years
+        self.summary_cache_path = summary_cache_path or os.path.join(results_dir, "summary_cache.json")
         self.sections = []
         self.hierarchical = False
-        self.load_or_process()
-
-    def get_cache_filename(self):
+        self.index = None  # SectionIndex over breadcrumb paths, built once the hierarchy exists
+        self.running_templates = []  # Running header/footer lines found by the last PDF parse
+        self.parents = None  # id(section) -> parent section (or None), i.e. the hierarchy stack links
+        self.summary_latencies = []  # Per-section records from the last async_summarize run
+        self.tenant = tenant  # LLM usage is also charged to "tenant:<id>", whose budget is set on TOKENS
+        if token_budget is not None:
+            TOKENS.set_budget(self.token_scopes()[0], token_budget)
+        if process:  # process=False leaves the booklet empty for callers that run the ingest stages themselves
+            self.load_or_process()
+
+    def get_cache_filename(self, cache_format=None):
         base_name = "booklet"
-        return os.path.join(self.results_dir, f"{base_name}_cache.json")
-
-    def parallel_summarize(self, max_workers=1):
-        print("Starting parallel summarization...")
-        sections_to_summarize = [section for section in self.sections if section.summary is None]
+        extension = "bkc" if (cache_format or self.cache_format) == "mmap" else "json"
+        return os.path.join(self.results_dir, f"{base_name}_cache.{extension}")
 
-        if not sections_to_summarize:
-            print("No sections require summarization.")
-            return
+    def token_scopes(self) -> Tuple[str, ...]:
+        """Token accounting scopes for this booklet's LLM calls: the booklet, then its tenant."""
+        return (f"booklet:{os.path.abspath(self.results_dir)}",) + ((f"tenant:{self.tenant}",) if self.tenant else ())
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(section.summarize): section for section in sections_to_summarize}
+    def get_checkpoint_filename(self):
+        return os.path.join(self.results_dir, "booklet_checkpoint.jsonl")
 
-            for future in concurrent.futures.as_completed(futures):
-                section = futures[future]
-                try:
-                    future.result()  # Get the result to raise any exceptions
-                    print(f"Summarized section: {section.heading}")
-                except Exception as e:
-                    print(f"Error summarizing section {section.heading}: {e}")
+    async def async_summarize(self, sections: Optional[Iterable[BookletSection]] = None,
+                              checkpoint: Optional[SummaryCheckpoint] = None, concurrency=8,
+                              rpm=RATE_LIMIT_RPM, tpm=RATE_LIMIT_TPM, batch=True,
+                              short_section_tokens=150, batch_token_budget=1500) -> List[Dict[str, Any]]:
+        """
+        Summarize pending sections on the async OpenAI client as they arrive.
+
+        `sections` defaults to self.sections. Pass a generator such as
+        iter_sections() to stream: it is advanced in a worker thread, each
+        section is appended to self.sections, and its request goes out while
+        later pages are still being parsed.
+
+        At most `concurrency` requests are in flight, and a shared RateLimiter
+        keeps the run inside the requests/tokens-per-minute budget; 429s are
+        retried with exponential backoff inside acallGPT. With batch=True,
+        sections of at most short_section_tokens are packed, in document order,
+        into one request per batch_token_budget; sections a batch fails to
+        return fall back to single-section calls. Every finished summary is
+        appended to `checkpoint`, and summaries already in it are reused.
+        Returns per-section latency records:
+        [{'heading': str, 'sequence': int, 'latency': float, 'ok': bool, 'batched': bool}]
+        """
+        log.info("Starting async summarization...")
+        streaming = sections is not None
+        if not streaming:
+            if all(section.summary is not None for section in self.sections):
+                log.info("No sections require summarization.")
+                return []
+            sections = list(self.sections)
+
+        summary_cache = SummaryCache(self.summary_cache_path)
+        semaphore = asyncio.Semaphore(concurrency)
+        limiter = RateLimiter(rpm=rpm, tpm=tpm)
+        groups = {}  # content key -> sections sharing one request; later duplicates join the group
+        tasks, current, current_tokens, hits = [], [], 0, 0
+        exhausted = None  # TokenBudgetExceeded from the first rejected call
+
+        def record(sections, latency, ok, batched=False):
+            return {"heading": sections[0].heading, "sequence": sections[0].sequence,
+                    "latency": latency, "ok": ok, "batched": batched}
+
+        def complete(key, sections, summary_data):
+            for section in sections:
+                section.apply_summary(summary_data)
+            summary_cache.put(key, summary_data)
+            if checkpoint is not None:
+                checkpoint.append(key, summary_data)
+
+        async def summarize_group(key, sections):
+            async with semaphore:
+                started = time.perf_counter()
+                with TELEMETRY.span("summarize", heading=sections[0].heading, sequence=sections[0].sequence,
+                                    sections=len(sections), batched=False) as span:
+                    try:
+                        summary_data = await asummarize_text(sections[0].heading, sections[0].body, limiter=limiter)
+                        complete(key, sections, summary_data)
+                        ok = True
+                    except TokenBudgetExceeded as e:
+                        reject(e)
+                        ok = False
+                    except Exception as e:
+                        log.warning("Error summarizing section %s: %s", sections[0].heading, e)
+                        ok = False
+                    span.set(ok=ok)
+                latency = time.perf_counter() - started
+                log.debug("Summarized section: %s (%.2fs)", sections[0].heading, latency)
+                return [record(sections, latency, ok)]
+
+        async def summarize_batch(groups):
+            async with semaphore:
+                started = time.perf_counter()
+                with TELEMETRY.span("summarize", sequence=groups[0][1][0].sequence, sections=len(groups),
+                                    batched=True) as span:
+                    try:
+                        summaries = await asummarize_batch([(sections[0].heading, sections[0].body)
+                                                            for _, sections in groups], limiter=limiter)
+                    except TokenBudgetExceeded as e:
+                        reject(e)
+                        return [record(sections, 0.0, False, batched=True) for _, sections in groups]
+                    except Exception as e:
+                        log.warning("Error summarizing batch of %d sections: %s", len(groups), e)
+                        summaries = [None] * len(groups)  # Every section falls back to its own call below
+                    span.set(returned=sum(summary is not None for summary in summaries))
+                latency = time.perf_counter() - started
+
+            records, fallback = [], []
+            for (key, sections), summary_data in zip(groups, summaries):
+                if summary_data is None:
+                    fallback.append((key, sections))
+                    continue
+                complete(key, sections, summary_data)
+                records.append(record(sections, latency, True, batched=True))
+            log.debug("Summarized batch of %d sections (%.2fs)", len(groups) - len(fallback), latency)
+
+            if fallback:
+                log.info("Batch output incomplete; falling back to single calls for %d sections.", len(fallback))
+                for group_records in await asyncio.gather(*(summarize_group(key, sections)
+                                                           for key, sections in fallback)):
+                    records.extend(group_records)
+            return records
+
+        def reject(error):
+            nonlocal exhausted
+            if exhausted is None:
+                log.warning("Token budget exhausted; no further sections will be sent: %s", error)
+                exhausted = error
+
+        def flush():
+            """Send the batch being packed; a batch of one goes out as a single request."""
+            nonlocal current, current_tokens
+            if len(current) == 1:
+                tasks.append(asyncio.create_task(summarize_group(*current[0])))
+            elif current:
+                tasks.append(asyncio.create_task(summarize_batch(current)))
+            current, current_tokens = [], 0
+
+        started = time.perf_counter()
+        iterator = iter(sections)
+        while exhausted is None:
+            # Parsing runs off the event loop so in-flight requests keep making progress
+            section = await asyncio.to_thread(next, iterator, None) if streaming else next(iterator, None)
+            if section is None:
+                break
+            if streaming:
+                self.sections.append(section)
+            if section.summary is not None:
+                continue
+
+            key = SummaryCache.key(section.heading, section.body)
+            cached = checkpoint.get(key) if checkpoint is not None else None
+            if cached is not None:
+                summary_cache.put(key, cached)
+            else:
+                cached = summary_cache.get(key)
+            if cached is not None:
+                section.apply_summary(cached)
+                hits += 1
+                continue
+            if key in groups:
+                groups[key].append(section)  # Summarized by the request already planned for this text
+                continue
+
+            groups[key] = [section]
+            tokens = estimate_tokens(section.heading) + estimate_tokens(section.body)
+            if not batch or tokens > short_section_tokens:
+                tasks.append(asyncio.create_task(summarize_group(key, groups[key])))
+                continue
+            if current and current_tokens + tokens > batch_token_budget:
+                flush()
+            current.append((key, groups[key]))
+            current_tokens += tokens
+        if exhausted is None:
+            flush()
+
+        log.info("Summary cache: %d hits, %d LLM calls needed.", hits, len(groups))
+        TELEMETRY.count("summary_cache_hits", hits)
+        results = await asyncio.gather(*tasks)
+        summary_cache.save()
+        if exhausted is not None:
+            # Finished summaries are in the cache and checkpoint; the caller decides what to do next
+            raise exhausted
+        latencies = [r for group_records in results for r in group_records]
+        log.info("Async summarization completed: %d planned requests for %d sections in %.2fs.",
+                 len(tasks), len(latencies), time.perf_counter() - started)
+        return latencies
 
-        print("Parallel summarization completed.")
+    @classmethod
+    def open_cache(cls, results_dir: str, cache_format: str = "json") -> "BenefitsBooklet":
+        """
+        Open a booklet's existing cache read-only, for serving: nothing is
+        parsed, summarized or written back. A flat cache gets its hierarchy
+        rebuilt in memory, and a JSON cache opened as "mmap" is not migrated.
+        Raises FileNotFoundError when there is no readable cache.
+        """
+        book = cls(pdf_path=None, results_dir=results_dir, summarize=False, cache_format=cache_format,
+                   process=False)
+        if not book.load(migrate=False):
+            raise FileNotFoundError(f"No readable booklet cache in {results_dir}")
+        if book.hierarchical:
+            book.build_index()
+        else:
+            book.reconstruct_hierarchy()
+        return book
 
+    @TELEMETRY.traced("ingest")
     def load_or_process(self):
-        cache_filename = self.get_cache_filename()
-        cached_data = load_cache(cache_filename)
-
-        if cached_data:
-            self.sections = [BookletSection.from_dict(s) for s in cached_data["provisions"]]
-            self.hierarchical = cached_data.get("hierarchical", False)
-            print("Booklet cache loaded successfully.")
+        TELEMETRY.annotate(pdf=os.path.basename(self.pdf_path or ""), summarize=self.summarize)
+        if self.load():
+            log.info("Booklet cache loaded successfully.")
             if not self.hierarchical:
                 self.reconstruct_hierarchy()
-                data = {
-                    "provisions": [section.to_dict() for section in self.sections],
-                    "hierarchical": self.hierarchical
-                }
-                save_cache(data, cache_filename)
-                print("Data saved to cache.")
+                self.save()
+            else:
+                self.build_index()
 
         else:
-            print("Cache not found or failed to load. Parsing PDF...")
-            self.parse_pdf()
-
-            # Run parallel summarization
-            self.parallel_summarize()
+            if self.pdf_path is None:
+                raise FileNotFoundError(f"No readable booklet cache in {self.results_dir} and no PDF to parse")
+            log.info("Cache not found or failed to load. Parsing PDF...")
+            TOKENS.reset(self.token_scopes()[0])  # A booklet's budget covers one parse, not earlier ones
+            if self.summarize:
+                # Summaries go out while later pages are still being parsed
+                checkpoint = SummaryCheckpoint(self.get_checkpoint_filename())
+                self.sections = []
+                try:
+                    with token_scope(*self.token_scopes()):
+                        self.summary_latencies = asyncio.run(closing_clients(
+                            self.async_summarize(self.iter_sections(), checkpoint=checkpoint)))
+                finally:
+                    checkpoint.close()
+            else:
+                self.parse_pdf()
 
             # Reconstruct the hierarchy after summarization
             self.reconstruct_hierarchy()
 
-            # Save the processed data to the cache
-            data = {
-                "provisions": [section.to_dict() for section in self.sections],
-                "hierarchical": self.hierarchical
-            }
-            save_cache(data, cache_filename)
-            print("Data saved to cache.")
+            # Save the processed data to the cache; the checkpoint is no longer needed
+            self.save()
+            if self.summarize:
+                checkpoint.discard()
 
-    def build_style_list(self, pdf_document) -> List[Dict[str, Any]]:
-        #page_width = get_page_width(pdf_document)
-        page_left_margin, page_right_margin = get_page_width(pdf_document)
+    @TELEMETRY.traced("cache_load")
+    def load(self, migrate: bool = True) -> bool:
+        """
+        Populate sections from the cache. The mapped format only decodes the
+        header; bodies stay on disk until read. A JSON cache found while the
+        mapped format is selected is loaded, and migrated on the spot unless
+        migrate=False.
+        """
+        TELEMETRY.annotate(format=self.cache_format)
+        if self.cache_format == "mmap":
+            mapped = load_mapped_cache(self.get_cache_filename())
+            if mapped:
+                records, mapped.sections = mapped.sections, None  # Sections own the header fields from here on
+                self.sections = [BookletSection.from_mapped(mapped, i, fields) for i, fields in enumerate(records)]
+                self.hierarchical = mapped.meta.get("hierarchical", False)
+                return True
+
+        cached_data = load_cache(self.get_cache_filename("json"))
+        if not cached_data:
+            return False
+        self.sections = [BookletSection.from_dict(s) for s in cached_data["provisions"]]
+        self.hierarchical = cached_data.get("hierarchical", False)
+        if migrate and self.cache_format == "mmap" and self.hierarchical:
+            self.save()
+        return True
+
+    @TELEMETRY.traced("cache_save")
+    def save(self):
+        """Write the booklet to its cache file (one full rewrite)."""
+        TELEMETRY.annotate(format=self.cache_format, sections=len(self.sections))
+        data = {
+            "provisions": [section.to_dict() for section in self.sections],
+            "hierarchical": self.hierarchical
+        }
+        if self.cache_format == "mmap":
+            save_mapped_cache(data, self.get_cache_filename())
+        else:
+            save_cache(data, self.get_cache_filename())
+        log.info("Data saved to cache.")
+
+    def export_json(self, filename=None):
+        """Write the JSON form of the cache (for debugging a mapped cache)."""
+        data = {
+            "provisions": [section.to_dict() for section in self.sections],
+            "hierarchical": self.hierarchical
+        }
+        save_cache(data, filename or self.get_cache_filename("json"))
+
+    def build_style_list(self, pages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        page_left_margin, page_right_margin = get_page_width(pages)
 
         style_dict = defaultdict(lambda: {"count": 0, "pages": set(), "text": set()})
 
-        for page_num in range(pdf_document.page_count):
-            page = pdf_document.load_page(page_num)
-            blocks = page.get_text("dict")["blocks"]
-            page_fonts = page.get_fonts()
+        for page in pages:
+            page_num = page["number"]
+            page_fonts = page["font_map"]
 
-            for block in blocks:
-                if "lines" in block:
-                    for line in block["lines"]:
-                        for span in line["spans"]:
-                            style_key = extract_span_style(span, page_left_margin, page_right_margin, page_fonts)
-                            style_dict[style_key]["count"] += 1
-                            style_dict[style_key]["pages"].add(page_num + 1)
-                            style_dict[style_key]["text"].add(span["text"])
+            for block in page["blocks"]:
+                for line in block["lines"]:
+                    for span in line["spans"]:
+                        style_key = extract_span_style(span, page_left_margin, page_right_margin, page_fonts)
+                        style_dict[style_key]["count"] += 1
+                        style_dict[style_key]["pages"].add(page_num + 1)
+                        style_dict[style_key]["text"].add(span["text"])
 
         style_list = [
             {
@@ -158,9 +703,15 @@ class BenefitsBooklet:
 
         return sorted(style_list, key=lambda x: (-x["span_count"], -x["unique_pages"]))
 
-    def extract_text_with_headers_footers(self, header_margin=0, footer_margin=0) -> List[Dict[str, Any]]:
+    def extract_text_with_headers_footers(self, header_margin=0, footer_margin=0) -> Iterator[Dict[str, Any]]:
+        """
+        Yield provisions in document order, each as soon as the next heading
+        closes it. Page decoding, the style list and running header/footer
+        detection are document-wide and still happen before the first yield.
+        """
 
         def evaluate_group(group_text, style_key, page_num):
+            """Add a line group to the open provision; return the provision a new heading closed, if any."""
             nonlocal current_provision, sequence
             font_size, formatting = style_key[0], ", ".join(style_key[1])
             alignment, indentation = style_key[2], style_key[3]
@@ -186,14 +737,16 @@ class BenefitsBooklet:
                 header = False
 
             # Check 4: Check that Header Style is Repeated
-            style = lookup_style(style_list, attributes)
+            style = style_index.lookup(attributes)
             if style:
                 if style["unique_pages"] < 2 or style["span_count"] < 3:
-                    print(f"...dropped {group_text} -> unique pages is only {style['unique_pages']} | {attributes}")
+                    if debug:
+                        log.debug("...dropped %s -> unique pages is only %d | %s",
+                                  group_text, style['unique_pages'], attributes)
                     header = False
             else:
                 if "Mixed" not in style_key[1]:
-                    print(f"error, no style found: {group_text} | {style_key} | {page_num}")
+                    log.warning("No style found: %s | %s | %s", group_text, style_key, page_num)
 
             # Check 5: Check if it is too short for a Header
             if len(group_text) < 3:
@@ -206,14 +759,14 @@ class BenefitsBooklet:
             # Check 7: Check for Phrases that Automatically Qualify as Header
             if group_text in ["Summary of Benefits", "Table of Contents", "Schedule of Benefits",
                                   "Benefit Schedule", "Benefit Summary"]:
-                print(f"automatically included {group_text}")
+                if debug:
+                    log.debug("Automatically included %s", group_text)
                 header = True
 
             # Create a New Section or add Text to Section Body
             if header:
-                # Stores Previous Section & Opens New Section
-                if current_provision:
-                    result.append(current_provision)
+                # Closes Previous Section & Opens New Section
+                closed = current_provision
                 current_provision = {
                     'heading': group_text.strip(),
                     'attributes': attributes,
@@ -222,81 +775,34 @@ class BenefitsBooklet:
                     'page': page_num + 1
                 }
                 sequence += 1
-                print(f"New heading: {group_text.strip()} | {attributes}")
+                if debug:
+                    log.debug("New heading: %s | %s", group_text.strip(), attributes)
+                return closed
             else:
                 current_provision['body'] += group_text + " "
+            return None
 
-        def get_page_initial_lines(page_num, max_lines=5):
-            """Get the first few lines of a page, stopping at first content difference"""
-            if page_num < 0 or page_num >= pdf_document.page_count:
-                return []
-
-            page = pdf_document.load_page(page_num)
-            blocks = page.get_text("dict", sort=True)["blocks"]
-            lines = []
-
-            # Collect all lines with their positions
-            for block in blocks:
-                if "lines" in block:
-                    for line in block["lines"]:
-                        if line["spans"]:
-                            line_text = " ".join(span["text"] for span in line["spans"]).strip()
-                            bbox = line["spans"][0]["bbox"]
-                            if line_text:
-                                lines.append({
-                                    "text": line_text,
-                                    "bbox": bbox,
-                                    "top": bbox[1]  # y1 coordinate
-                                })
-
-            # Sort by top position
-            lines.sort(key=lambda x: x["top"])
-
-            # Return first N lines
-            return lines[:max_lines]
-
-        def get_page_final_lines(page_num, max_lines=5):
-            """Get the last few lines of a page, from bottom up"""
-            if page_num < 0 or page_num >= pdf_document.page_count:
-                return []
-
-            page = pdf_document.load_page(page_num)
-            blocks = page.get_text("dict", sort=True)["blocks"]
-            lines = []
-
-            # Collect all lines with their positions
-            for block in blocks:
-                if "lines" in block:
-                    for line in block["lines"]:
-                        if line["spans"]:
-                            line_text = " ".join(span["text"] for span in line["spans"]).strip()
-                            bbox = line["spans"][0]["bbox"]
-                            if line_text:
-                                lines.append({
-                                    "text": line_text,
-                                    "bbox": bbox,
-                                    "bottom": bbox[3]  # y2 coordinate
-                                })
-
-            # Sort by bottom position, reverse to get bottom-up order
-            lines.sort(key=lambda x: x["bottom"], reverse=True)
-
-            # Return first N lines from bottom
-            return lines[:max_lines]
+        def is_empty_preamble(provision):
+            return provision['sequence'] == 0 and not provision['body'].strip()
 
+        debug = log.isEnabledFor(logging.DEBUG)  # Checked once; per-line messages cost nothing when quiet
         header_margin = float(header_margin)
         footer_margin = float(footer_margin)
-        pdf_document = fitz.open(self.pdf_path)
-        style_list = self.build_style_list(pdf_document)
+        with TELEMETRY.span("pdf_open", workers=self.workers) as span:
+            pages = load_pages(self.pdf_path, workers=self.workers)
+            span.set(pages=len(pages))
+        with TELEMETRY.span("style_list") as span:
+            style_list = self.build_style_list(pages)
+            span.set(styles=len(style_list))
+        style_index = StyleIndex(style_list)
         normal_font_style = style_list[0]
         normal_font_size = normal_font_style["attributes"]["size"]
 
-        print("\nSTYLE LIST")
-        for style in style_list:
-            print(style)
-        print(f"Total # of styles are {len(style_list)}\n")
+        if debug:
+            log.debug("STYLE LIST\n%s", "\n".join(map(str, style_list)))
+        log.info("Total # of styles are %d", len(style_list))
 
-        result = []
+        extracted = 0
         current_provision = {
             'heading': 'Preamble',
             'attributes': {"size": normal_font_size,"formatting": "regular","indentation": 0,"page": 1,"alignment": "left"},
@@ -309,204 +815,230 @@ class BenefitsBooklet:
         current_style_key = None
         previous_page_first_lines = []
 
-        #effective_width = get_page_width(pdf_document)
-        page_left_margin, page_right_margin = get_page_width(pdf_document)
-
-        for page_num in range(pdf_document.page_count):
-            page = pdf_document.load_page(page_num)
-            blocks = page.get_text("dict", sort=True)["blocks"]
-            page_height = page.rect.height
-            page_fonts = page.get_fonts()
-            #is_first_line_on_page = True
-
-            # Get initial lines from current, previous and next pages
-            current_lines = get_page_initial_lines(page_num)
-            prev_lines = get_page_initial_lines(page_num - 1)  # Adjacent previous
-            #next_lines = get_page_initial_lines(page_num + 1)  # Adjacent next
-            prev2_lines = get_page_initial_lines(page_num - 2)  # Alternating previous
-            #next2_lines = get_page_initial_lines(page_num + 2)  # Alternating next
-
-            # Find how many lines match with previous and next pages
-            header_lines = []
-            for i, current in enumerate(current_lines):
-                # Remove digits before comparing
-                current_text = ''.join(c for c in current["text"] if not c.isdigit()).strip()
-
-                # Check if this line matches in any of the surrounding pages
-                prev_match = (i < len(prev_lines) and
-                              current_text == ''.join(c for c in prev_lines[i]["text"] if not c.isdigit()).strip())
-                #next_match = (i < len(next_lines) and
-                #              current_text == ''.join(c for c in next_lines[i]["text"] if not c.isdigit()).strip())
-                prev2_match = (i < len(prev2_lines) and
-                               current_text == ''.join(c for c in prev2_lines[i]["text"] if not c.isdigit()).strip())
-                #next2_match = (i < len(next2_lines) and
-                #               current_text == ''.join(c for c in next2_lines[i]["text"] if not c.isdigit()).strip())
-
-                # Line is a header if it matches either adjacent pages OR alternating pages
-                #if prev_match or next_match or prev2_match or next2_match:
-
-                if prev_match or prev2_match:
-                    header_lines.append((current["text"], current["top"]))
-                else:
-                    break
+        with TELEMETRY.span("margin_scan"):
+            page_left_margin, page_right_margin = get_page_width(pages)
+        with TELEMETRY.span("header_footer_detection") as span:
+            running_lines, self.running_templates = detect_running_lines(pages)
+            span.set(templates=len(self.running_templates))
 
-            # Get final lines from current and surrounding pages
-            current_lines = get_page_final_lines(page_num)
-            prev_lines = get_page_final_lines(page_num - 1)
-            next_lines = get_page_final_lines(page_num + 1)
-            prev2_lines = get_page_final_lines(page_num - 2)
-            next2_lines = get_page_final_lines(page_num + 2)
-
-            # Find how many lines match from bottom up
-            footer_lines = []
-            for i, current in enumerate(current_lines):
-                # Remove digits before comparing
-                current_text = ''.join(c for c in current["text"] if not c.isdigit()).strip()
-
-                # Compare with corresponding lines in other pages
-                prev_match = (i < len(prev_lines) and
-                              current_text == ''.join(c for c in prev_lines[i]["text"] if not c.isdigit()).strip())
-                next_match = (i < len(next_lines) and
-                              current_text == ''.join(c for c in next_lines[i]["text"] if not c.isdigit()).strip())
-                prev2_match = (i < len(prev2_lines) and
-                               current_text == ''.join(
-                            c for c in prev2_lines[i]["text"] if not c.isdigit()).strip())
-                next2_match = (i < len(next2_lines) and
-                               current_text == ''.join(
-                            c for c in next2_lines[i]["text"] if not c.isdigit()).strip())
-
-                if prev_match or next_match or prev2_match or next2_match:
-                    footer_lines.append((current["text"], current["bottom"]))
-                else:
-                    break
+        # Only time spent in here counts; the consumer runs between yields
+        grouping = TELEMETRY.stopwatch("grouping", pages=len(pages))
+        for page in pages:
+            page_num = page["number"]
+            blocks = page["sorted_blocks"]
+            page_fonts = page["font_map"]
+
+            header_lines = running_lines["header"][page_num]
+            footer_lines = running_lines["footer"][page_num]
 
             lines_processed = 0
             lines_processed_from_bottom = 0
 
             for block in blocks:
-                if "lines" in block:
-                    for line in block["lines"]:
-                        first_span = line["spans"][0] if line["spans"] else None
-                        if not first_span:
-                            continue
-
-                        line_text = " ".join(span["text"] for span in line["spans"]).strip()
-                        if not line_text:
-                            continue
-
-                        bbox = first_span["bbox"]
-
-                        # Skip if it's part of the page header
-                        if any(line_text == h[0] and abs(bbox[1] - h[1]) < 5 for h in header_lines):
-                            print(f"Skipping header line: {line_text[:50]}...")
-                            continue
-
-                        # Skip if it's part of the page footer
-                        if any(line_text == f[0] and abs(bbox[3] - f[1]) < 5 for f in footer_lines):
-                            print(f"Skipping footer line: {line_text[:50]}...")
-                            continue
-
-                        # Get style info for this line
-                        line_text = clean_text(line_text)
-                        style_key = extract_span_style(first_span, page_left_margin, page_right_margin, page_fonts)
-
-                        # Accumulate Lines with Same Style. Allocate to Heading or Body.
-                        consistent_style_across_line = line_has_one_style(line)
-                        if consistent_style_across_line and style_matches(style_key, current_style_key):
-                            accumulated_text += " " + line_text
-                        else:
-                            if accumulated_text:
-                                evaluate_group(accumulated_text, current_style_key, page_num)
-                            accumulated_text = line_text
-                            current_style_key = style_key
-                            if not consistent_style_across_line:
-                                current_style_key = (0, ('Mixed'), 'Mixed', 0)    # Just add a style that will never match so that mixed line is processed by itself
+                for line in block["lines"]:
+                    first_span = line["spans"][0] if line["spans"] else None
+                    if not first_span:
+                        continue
+
+                    line_text = " ".join(span["text"] for span in line["spans"]).strip()
+                    if not line_text:
+                        continue
+
+                    bbox = first_span["bbox"]
+
+                    # Skip if it's part of the page header
+                    if any(line_text == h[0] and abs(bbox[1] - h[1]) < 5 for h in header_lines):
+                        if debug:
+                            log.debug("Skipping header line: %.50s...", line_text)
+                        continue
+
+                    # Skip if it's part of the page footer
+                    if any(line_text == f[0] and abs(bbox[3] - f[1]) < 5 for f in footer_lines):
+                        if debug:
+                            log.debug("Skipping footer line: %.50s...", line_text)
+                        continue
+
+                    # Get style info for this line
+                    line_text = clean_text(line_text)
+                    style_key = extract_span_style(first_span, page_left_margin, page_right_margin, page_fonts)
+
+                    # Accumulate Lines with Same Style. Allocate to Heading or Body.
+                    consistent_style_across_line = line_has_one_style(line)
+                    if consistent_style_across_line and style_matches(style_key, current_style_key):
+                        accumulated_text += " " + line_text
+                    else:
+                        if accumulated_text:
+                            closed = evaluate_group(accumulated_text, current_style_key, page_num)
+                            if closed and not is_empty_preamble(closed):
+                                extracted += 1
+                                grouping.pause()
+                                yield closed
+                                grouping.resume()
+                        accumulated_text = line_text
+                        current_style_key = style_key
+                        if not consistent_style_across_line:
+                            current_style_key = (0, ('Mixed'), 'Mixed', 0)    # Just add a style that will never match so that mixed line is processed by itself
 
             # Evaluate any remaining accumulated text at the end of the page
             if accumulated_text:
-                evaluate_group(accumulated_text, current_style_key, page_num)
+                closed = evaluate_group(accumulated_text, current_style_key, page_num)
+                if closed and not is_empty_preamble(closed):
+                    extracted += 1
+                    grouping.pause()
+                    yield closed
+                    grouping.resume()
                 accumulated_text = ""
                 current_style_key = None
 
-        # Add the last provision if it exists
-        if current_provision:
-            result.append(current_provision)
-
-        # Remove the preamble if it's empty
-        if result[0]['heading'] == 'Preamble' and not result[0]['body'].strip():
-            result.pop(0)
+        # The last provision is closed by the end of the document (the preamble is dropped if empty)
+        grouping.finish(provisions=extracted + (not is_empty_preamble(current_provision)))
+        if not is_empty_preamble(current_provision):
+            extracted += 1
+            yield current_provision
 
-        print(f"Extraction complete. Total provisions extracted: {len(result)}")
-        return result
+        log.info("Extraction complete. Total provisions extracted: %d", extracted)
 
-    def parse_pdf(self):
-        # Extract text from the PDF
-        extracted_provisions = self.extract_text_with_headers_footers()
-
-        # Create sections from the extracted provisions
-        self.sections = [
-            BookletSection(
+    def iter_sections(self) -> Iterator[BookletSection]:
+        """Stream BookletSections straight from the PDF parse."""
+        for p in self.extract_text_with_headers_footers():
+            yield BookletSection(
                 p['heading'],
                 p['attributes'],
                 p['body'],
                 sequence=p['sequence'],
                 page=p['page']
             )
-            for p in extracted_provisions
-        ]
-        print("Parsed PDF.")
 
+    def parse_pdf(self):
+        # Extract text from the PDF and create sections from the extracted provisions
+        self.sections = list(self.iter_sections())
+        log.info("Parsed PDF.")
+
+    @TELEMETRY.traced("hierarchy")
     def reconstruct_hierarchy(self):
         if not self.hierarchical:
-            self.sections.sort(key=lambda p: p.sequence)
+            self.sections.sort(key=document_order)
+            self.link_hierarchy()
+            self.hierarchical = True
+            self.build_index()
+            log.info("Reconstructed heading hierarchy.")
+
+    def link_hierarchy(self):
+        """Full pass: assign every breadcrumb and record each section's parent."""
+        hierarchy = []
+        self.parents = {}
+        for section in self.sections:
+            advance_hierarchy(hierarchy, section)
+            self.parents[id(section)] = hierarchy[-2] if len(hierarchy) > 1 else None
 
-            # Initialize the hierarchy stack with the first provision
-            hierarchy = [self.sections[0]]
-            self.sections[0].breadcrumb_heading = self.sections[0].heading
-            #print(self.sections[0].breadcrumb_heading)
+    def link_parents_from_breadcrumbs(self):
+        """
+        Recover parent links from stored breadcrumbs (e.g. after a cache load).
+        A section's parent is the latest preceding section whose breadcrumb is
+        its own minus the last heading: that is the entry left on the stack.
+        """
+        latest = {}
+        self.parents = {}
+        for section in self.sections:
+            parent_path, separator, _ = section.breadcrumb_heading.rpartition(BREADCRUMB_SEPARATOR)
+            self.parents[id(section)] = latest.get(parent_path) if separator else None
+            latest[section.breadcrumb_heading] = section
 
-            for section in self.sections[1:]:
+    @TELEMETRY.traced("hierarchy_update")
+    def update_sections(self, inserted=(), removed=(), updated=(), save=True):
+        """
+        Apply a batch of section changes and repair the hierarchy incrementally.
 
+        inserted: new BookletSections, placed by their sequence number.
+        removed: sections to drop from the booklet.
+        updated: sections whose heading or attributes were changed in place.
 
-                comparison = compare_headings(section, hierarchy[-1])
+        Breadcrumbs are recomputed from the first changed position only until
+        the heading stack is back to what it was before the change, so edits
+        touch just the affected subtree. The cache is written once per call.
+        """
+        TELEMETRY.annotate(inserted=len(inserted), removed=len(removed), updated=len(updated))
+        if not self.hierarchical:
+            self.sections.extend(inserted)
+            self.sections = [s for s in self.sections if all(s is not r for r in removed)]
+            self.reconstruct_hierarchy()
+        else:
+            if self.parents is None:
+                self.link_parents_from_breadcrumbs()
+            if self.index is None:
+                self.build_index()
+
+            changed = {id(section) for section in updated}
+            changed.update(id(section) for section in inserted)
+            removed_ids = {id(section) for section in removed}
+
+            # The section after a removed one is where its children get re-parented
+            dirty = set(changed)
+            survivors = []
+            follows_removed = False
+            for section in self.sections:
+                if id(section) in removed_ids:
+                    follows_removed = True
+                    continue
+                if follows_removed:
+                    dirty.add(id(section))
+                    follows_removed = False
+                survivors.append(section)
+            self.sections = survivors
+            for section in removed:
+                self.index.remove(section)
+                self.parents.pop(id(section), None)
+
+            for section in inserted:
+                position = bisect.bisect_right(self.sections, document_order(section), key=document_order)
+                self.sections.insert(position, section)
+
+            positions = [i for i, s in enumerate(self.sections) if id(s) in dirty]
+            if positions:
+                self.relink_hierarchy(min(positions), max(positions), changed)
+
+        if save:
+            self.save()
+
+    def relink_hierarchy(self, start: int, last_changed: int, changed: set):
+        """
+        Recompute breadcrumbs from self.sections[start] onward. Past the last
+        changed position, stop as soon as a section's heading stack matches its
+        previous stack and contains no changed section (everything after it is
+        then unaffected).
+        """
+        def chain(section, parent_of):
+            stack = [section]
+            while parent_of(stack[-1]) is not None:
+                stack.append(parent_of(stack[-1]))
+            return stack[::-1]
 
-                # Compare with the last item in the hierarchy
-                while comparison > 0:
-                    hierarchy.pop()
-                    if hierarchy:
-                        comparison = compare_headings(section, hierarchy[-1])
-                    else:
-                        comparison = 0
+        def old_parent(section):
+            return previous_parents.get(id(section), self.parents.get(id(section)))
 
-                # If we reached the top, start a new branch
-                if not hierarchy:
-                    hierarchy = [section]
-                    section.breadcrumb_heading = section.heading
+        previous_parents = {}  # Parents of recomputed sections before this pass (NEW_SECTION if inserted)
+        hierarchy = chain(self.sections[start - 1], old_parent) if start > 0 else []
 
-                # If it's equal, add at the same level (sibling)
-                elif comparison == 0:
-                    hierarchy.pop()
-                    hierarchy.append(section)
-                    section.breadcrumb_heading = ' -> '.join([h.heading for h in hierarchy])
+        for position in range(start, len(self.sections)):
+            section = self.sections[position]
+            old_breadcrumb = section.breadcrumb_heading
+            previous_parents[id(section)] = self.parents.get(id(section), NEW_SECTION)
 
-                # If it's "smaller", add as a child
-                else:
-                    hierarchy.append(section)
-                    section.breadcrumb_heading = ' -> '.join([h.heading for h in hierarchy])
+            advance_hierarchy(hierarchy, section)
+            self.parents[id(section)] = hierarchy[-2] if len(hierarchy) > 1 else None
 
-                #print(section.breadcrumb_heading)
+            if old_breadcrumb != section.breadcrumb_heading or id(section) in changed:
+                self.index.remove(section, old_breadcrumb)
+                self.index.add(section)
 
-            self.hierarchical = True
-            print("Reconstructed heading hierarchy.")
+            if position >= last_changed and not any(id(h) in changed for h in hierarchy):
+                if previous_parents[id(section)] is not NEW_SECTION and \
+                        [id(h) for h in hierarchy] == [id(h) for h in chain(section, old_parent)]:
+                    break
 
-            # Save the reconstructed hierarchy to the cache
-            cache_filename = self.get_cache_filename()
-            data = {
-                "provisions": [section.to_dict() for section in self.sections],
-                "hierarchical": self.hierarchical
-            }
-            save_cache(data, cache_filename)
-            print("Hierarchy saved to cache.")
+    def build_index(self):
+        """(Re)build the breadcrumb index used by the section lookup methods."""
+        self.index = SectionIndex(self.sections)
 
     def print_hierarchy(self):
         """Print the document hierarchy using breadcrumb headings"""
@@ -558,43 +1090,66 @@ class BenefitsBooklet:
                 'sub-sections': List[str]  # Only present for target section
             }]
         """
-        target_section = next((s for s in self.sections
-                               if s.breadcrumb_heading == breadcrumb_heading), None)
-        if not target_section:
-            return []
+        if self.index is None:
+            self.build_index()
 
-        target_path = breadcrumb_heading.split(' -> ')
-        context = []
+        if self.index.find(breadcrumb_heading) is None:
+            return []
 
         # Find sub-sections for target section
-        sub_sections = []
-        target_path_str = breadcrumb_heading + " -> "
-        for section in self.sections:
-            if (section.breadcrumb_heading.startswith(target_path_str) and
-                    len(section.breadcrumb_heading.split(' -> ')) == len(target_path) + 1):
-                sub_sections.append(section.heading)
+        sub_sections = [section.heading for section in self.index.children(breadcrumb_heading)]
 
         # Build context including ancestor sections
-        for section in self.sections:
-            section_path = section.breadcrumb_heading.split(' -> ')
-            if (len(section_path) <= len(target_path) and
-                    all(sp == tp for sp, tp in zip(section_path, target_path))):
-                section_dict = {
-                    'heading': section.heading,
-                    'breadcrumb_heading': section.breadcrumb_heading,
-                    'body': section.body,
-                    'classification': section.classification,
-                    'page': section.page
-                }
+        context = []
+        for section in self.index.ancestors(breadcrumb_heading):
+            section_dict = {
+                'heading': section.heading,
+                'breadcrumb_heading': section.breadcrumb_heading,
+                'body': section.body,
+                'classification': section.classification,
+                'page': section.page
+            }
 
-                # Add sub-sections only to target section
-                if section.breadcrumb_heading == breadcrumb_heading:
-                    section_dict['sub-sections'] = sub_sections
+            # Add sub-sections only to target section
+            if section.breadcrumb_heading == breadcrumb_heading:
+                section_dict['sub-sections'] = sub_sections
 
-                context.append(section_dict)
+            context.append(section_dict)
 
         return context
 
+    def get_sub_sections(self, breadcrumb_heading: str, recursive: bool = False) -> List[Dict[str, Any]]:
+        """
+        Get the sections nested under a breadcrumb path: direct children only,
+        or the whole subtree (excluding the section itself) when recursive=True.
+
+        Returns:
+            List[Dict] in document order:
+            [{
+                'heading': str,
+                'breadcrumb_heading': str,
+                'summary': str,
+                'classification': str,
+                'page': int
+            }]
+        """
+        if self.index is None:
+            self.build_index()
+
+        if recursive:
+            sections = [s for s in self.index.subtree(breadcrumb_heading)
+                        if s.breadcrumb_heading != breadcrumb_heading]
+        else:
+            sections = self.index.children(breadcrumb_heading)
+
+        return [{
+            'heading': s.heading,
+            'breadcrumb_heading': s.breadcrumb_heading,
+            'summary': s.summary,
+            'classification': s.classification,
+            'page': s.page
+        } for s in sections]
+
     def get_booklet_outline(self) -> List[Dict[str, Any]]:
         mini_booklet = [
             {
@@ -609,6 +1164,27 @@ class BenefitsBooklet:
 
 # HELPER METHODS BELOW
 
+def document_order(section):
+    return section.sequence
+
+def advance_hierarchy(hierarchy: List[BookletSection], section: BookletSection) -> None:
+    """
+    Push one section onto the heading stack: pop every entry the section
+    outranks, replace an equal-ranked sibling, and nest under a higher-ranked
+    heading. Sets the section's breadcrumb from the resulting stack.
+    """
+    while hierarchy:
+        comparison = compare_headings(section, hierarchy[-1])
+        if comparison > 0:
+            hierarchy.pop()
+            continue
+        # If it's equal, add at the same level (sibling)
+        if comparison == 0:
+            hierarchy.pop()
+        break
+    hierarchy.append(section)
+    section.breadcrumb_heading = BREADCRUMB_SEPARATOR.join([h.heading for h in hierarchy])
+
 def is_all_caps(text):
     return text.isupper() and any(c.isalpha() for c in text)
 
@@ -651,25 +1227,33 @@ def determine_alignment_and_indentation(bbox: List[float], page_left_margin: flo
     else:
         return "left", math.floor(left/5)*5
 
-def extract_span_style(span: Dict[str, Any], page_left_margin: float, page_right_margin: float, page_fonts: List[Tuple]) -> Tuple[Any, ...]:
+def extract_span_style(span: Dict[str, Any], page_left_margin: float, page_right_margin: float, page_fonts: Dict[str, Tuple]) -> Tuple[Any, ...]:
     font_size = round(float(span["size"]), 2)
     bbox = span["bbox"]
 
-    formatting, _ = extract_font_properties(span, page_fonts)
+    font = page_fonts.get(span["font"])
+    formatting = span_formatting(span["flags"], span["text"].strip(), bool(font and "allcaps" in font[2]))
     alignment, indentation = determine_alignment_and_indentation(bbox, page_left_margin, page_right_margin)
 
     return (
         font_size,
-        tuple(sorted(formatting)),
+        formatting,
         alignment,
         indentation
     )
 
-def extract_font_properties(span: Dict[str, Any], page_fonts: List[Tuple]) -> Tuple[List[str], str]:
-    font_flags = span["flags"]
-    font_name = span["font"]
+def extract_font_properties(span: Dict[str, Any], page_fonts: Dict[str, Tuple]) -> Tuple[List[str], str]:
     text = span["text"].strip()
+    font = page_fonts.get(span["font"])
+    formatting = span_formatting(span["flags"], text, bool(font and "allcaps" in font[2]))
+    if "ALL CAPS" in formatting:
+        text = text.upper()
+    return list(formatting), text
 
+@functools.lru_cache(maxsize=SPAN_FORMATTING_CACHE_SIZE)
+def span_formatting(font_flags: int, text: str, allcaps_font: bool) -> Tuple[str, ...]:
+    """Sorted formatting tags for a span. Booklets repeat the same span text on
+    nearly every page, so the case checks are memoized per distinct text."""
     formatting = []
     if font_flags & 2 or font_flags & 16:
         formatting.append("bold")
@@ -678,42 +1262,182 @@ def extract_font_properties(span: Dict[str, Any], page_fonts: List[Tuple]) -> Tu
     if font_flags & 8:
         formatting.append("underline")
 
-    font = next((f for f in page_fonts if f[3] == font_name), None)
-
-    if text.isupper() or (font and "allcaps" in font[2]):
+    if text.isupper() or allcaps_font:
         formatting.append("ALL CAPS")
-        text = text.upper()
     elif is_title_case(text):
         formatting.append("Title Case")
 
-    return formatting, text
+    return tuple(sorted(formatting))
 
-def get_page_width(pdf_document) -> float:
+def get_page_width(pages: List[Dict[str, Any]]) -> Tuple[float, float]:
     max_right = 0
     min_left = float('inf')
-    for page_num in range(pdf_document.page_count):
-        page = pdf_document.load_page(page_num)
-        blocks = page.get_text("dict")["blocks"]
-        #blocks = page.get_text("text")["blocks"]
-
-        for block in blocks:
-            if "lines" in block:
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        bbox = span["bbox"]
-                        min_left = min(min_left, bbox[0])
-                        max_right = max(max_right, bbox[2])
+    for page in pages:
+        for block in page["blocks"]:
+            for line in block["lines"]:
+                for span in line["spans"]:
+                    bbox = span["bbox"]
+                    min_left = min(min_left, bbox[0])
+                    max_right = max(max_right, bbox[2])
     return min_left, max_right
 
-def lookup_style(style_list: List[Dict[str, Any]], attributes: Dict[str, Any]) -> Dict[str, Any]:
-    for style in style_list:
-        if (style["attributes"]["size"] == attributes["size"] and
-                style["attributes"]["formatting"] == attributes["formatting"] and
-                style["attributes"]["alignment"] == attributes["alignment"] and
-                (attributes["alignment"] != "left" or
-                 style["attributes"]["indentation"] == attributes["indentation"])):
-            return style
-    return None
+def decode_page(page, page_num: int) -> Dict[str, Any]:
+    """
+    Decode one fitz page into a plain, page-indexed record. This is the only
+    place get_text() is called; margins, style statistics, header/footer
+    detection and body accumulation all read from the returned dict.
+    """
+    # Image blocks carry no "lines" and are never used downstream
+    blocks = [block for block in page.get_text("dict")["blocks"] if "lines" in block]
+    # Same ordering get_text("dict", sort=True) applies (stable sort on y1, x0)
+    sorted_blocks = sorted(blocks, key=lambda b: (b["bbox"][3], b["bbox"][0]))
+
+    lines = []
+    for block in sorted_blocks:
+        for line in block["lines"]:
+            if line["spans"]:
+                line_text = " ".join(span["text"] for span in line["spans"]).strip()
+                bbox = line["spans"][0]["bbox"]
+                if line_text:
+                    lines.append({"text": line_text, "bbox": bbox, "top": bbox[1], "bottom": bbox[3]})
+
+    fonts = page.get_fonts()
+    return {
+        "number": page_num,
+        "blocks": blocks,
+        "sorted_blocks": sorted_blocks,
+        "fonts": fonts,
+        "font_map": font_name_map(fonts),
+        "initial_lines": sorted(lines, key=lambda x: x["top"])[:EDGE_LINES],
+        "final_lines": sorted(lines, key=lambda x: x["bottom"], reverse=True)[:EDGE_LINES],
+    }
+
+def font_name_map(fonts: List[Tuple]) -> Dict[str, Tuple]:
+    """Map font name -> get_fonts() entry; the first entry for a name wins."""
+    font_map = {}
+    for font in fonts:
+        font_map.setdefault(font[3], font)
+    return font_map
+
+def decode_page_range(pdf_path: str, start: int, stop: int) -> List[Dict[str, Any]]:
+    """Decode pages [start, stop) from a document opened by this process."""
+    import fitz  # Deferred: PyMuPDF is only needed when a PDF is actually parsed
+    with fitz.open(pdf_path) as pdf_document:
+        return [decode_page(pdf_document.load_page(page_num), page_num)
+                for page_num in range(start, stop)]
+
+def load_pages(pdf_path: str, workers: int = 1) -> List[Dict[str, Any]]:
+    """
+    Open the PDF and decode every page into the page store. With workers > 1
+    the page range is split into contiguous chunks decoded in a process pool,
+    each worker opening its own fitz document; chunks are concatenated in page
+    order so the result is identical to the serial path.
+    """
+    import fitz  # Deferred: PyMuPDF is only needed when a PDF is actually parsed
+    with fitz.open(pdf_path) as pdf_document:
+        page_count = pdf_document.page_count
+        if workers <= 1 or page_count < 2:
+            return [decode_page(pdf_document.load_page(page_num), page_num)
+                    for page_num in range(page_count)]
+
+    workers = min(workers, page_count)
+    chunk_size = math.ceil(page_count / workers)
+    starts = list(range(0, page_count, chunk_size))
+    stops = [min(start + chunk_size, page_count) for start in starts]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = executor.map(decode_page_range, [pdf_path] * len(starts), starts, stops)
+        return [page for chunk in chunks for page in chunk]
+
+def normalize_edge_line(text: str) -> str:
+    """Strip digits (page numbers, dates) so running header/footer lines compare equal."""
+    if text.isascii():
+        return text.translate(ASCII_DIGITS).strip()
+    return ''.join(c for c in text if not c.isdigit()).strip()
+
+def edge_template(edge: str, line: Dict[str, Any], position: str) -> Tuple[str, str, int]:
+    """(edge, digit-normalized text, vertical band) of an edge line: what a running line repeats."""
+    return edge, normalize_edge_line(line["text"]), round(line[position] / RUNNING_LINE_BAND)
+
+def detect_running_lines(pages: List[Dict[str, Any]], window: int = RUNNING_LINE_WINDOW,
+                         share: float = RUNNING_LINE_SHARE):
+    """
+    Find running headers and footers across the whole document in one pass.
+
+    Every top/bottom edge line is counted in a single frequency table keyed by
+    (edge, digit-normalized text, vertical band), whichever of the EDGE_LINES
+    of that edge it is, so a header still matches on pages where another
+    line sorts above it. From each template's page list:
+      - one on at least `share` of all pages (booklet title, page numbers)
+        runs on all of them;
+      - otherwise it runs within each cluster of two or more pages no more
+        than `window` apart (a chapter title over its chapter, even with a
+        page or two without it in between); lone repeats far apart, such as
+        the same sub-heading in every chapter, are body text.
+    A header line is kept on the first page its text runs on, at whatever
+    position, since that is usually the chapter heading itself, unless the
+    text is on one of the `window` pages before it (the chapter heading set
+    lower on its opening page); footers are skipped on every page
+    they run on.
+    A page's header (footer) is the unbroken run of running lines from its
+    top (bottom) edge, so a repeated heading below page-specific text stays.
+
+    Returns ({"header": [...], "footer": [...]}, templates): per page, the
+    (text, top/bottom) pairs to skip; and the detected templates as
+    [{'edge': str, 'text': str, 'position': float, 'pages': List[int]}]
+    (1-based pages, position in points from the top of the page).
+    """
+    edges = (("header", "initial_lines", "top"), ("footer", "final_lines", "bottom"))
+    occurrences = defaultdict(list)  # edge template -> page numbers, ascending
+    seen = defaultdict(set)  # (edge, text) -> page numbers, at any position
+    for page in pages:
+        for edge, lines_key, position in edges:
+            for template in {edge_template(edge, line, position) for line in page[lines_key]}:
+                occurrences[template].append(page["number"])
+                seen[template[:2]].add(page["number"])
+
+    min_pages = max(2, math.ceil(share * len(pages)))
+    matched = {}  # template -> pages it runs on, ascending
+    for template, page_nums in occurrences.items():
+        if len(page_nums) >= min_pages:
+            runs = [page_nums]
+        else:
+            runs = [[page_nums[0]]]
+            for previous, current in zip(page_nums, page_nums[1:]):
+                if current - previous <= window:
+                    runs[-1].append(current)
+                else:
+                    runs.append([current])
+        matched[template] = [page_num for run in runs if len(run) > 1 for page_num in run]
+
+    first_run = {}  # (edge, text) -> first page it runs on, at any position
+    for (edge, text, _), page_nums in matched.items():
+        if edge == "header" and page_nums:
+            first_run[(edge, text)] = min(page_nums[0], first_run.get((edge, text), page_nums[0]))
+    heading_pages = {key: page_num for key, page_num in first_run.items()
+                     if not seen[key].intersection(range(page_num - window, page_num))}
+
+    running = set()  # (template, page number)
+    templates = []
+    for template, page_nums in matched.items():
+        page_nums = [page_num for page_num in page_nums if page_num != heading_pages.get(template[:2])]
+        if page_nums:
+            running.update((template, page_num) for page_num in page_nums)
+            edge, text, band = template
+            templates.append({"edge": edge, "text": text, "position": band * RUNNING_LINE_BAND,
+                              "pages": [page_num + 1 for page_num in page_nums]})
+
+    running_lines = {"header": [], "footer": []}
+    for page in pages:
+        for edge, lines_key, position in edges:
+            edge_lines = []
+            for line in page[lines_key]:
+                if (edge_template(edge, line, position), page["number"]) not in running:
+                    break
+                edge_lines.append((line["text"], line[position]))
+            running_lines[edge].append(edge_lines)
+
+    return running_lines, templates
 
 def clean_text(text):
     replacements = {
@@ -771,7 +1495,10 @@ def is_title_case(text):
 
     return True
 
-def summarize_text(heading: str, text: str) -> Dict[str, Any]:
+# Bump whenever the summarize_text prompt changes so cached summaries are not reused
+SUMMARY_PROMPT_VERSION = "1"
+
+def build_summary_prompt(heading: str, text: str) -> List[Dict[str, str]]:
     prompt = f"""
             # Input
             The following is a section from an employee benefits booklet under the heading: [{heading}]
@@ -837,20 +1564,205 @@ def summarize_text(heading: str, text: str) -> Dict[str, Any]:
             4. If the text is too short or vague to classify confidently, use the "Other" category and explain briefly in the summary.
             """
 
-    messages = [{"role": "system", "content": prompt}]
-    summary = callGPT(messages, JSONflag=True)
+    return [{"role": "system", "content": prompt}]
+
+def summarize_text(heading: str, text: str) -> Dict[str, Any]:
+    summary = callGPT(build_summary_prompt(heading, text), JSONflag=True)
+    return summary
+
+async def asummarize_text(heading: str, text: str, limiter: Optional[RateLimiter] = None) -> Dict[str, Any]:
+    summary = await acallGPT(build_summary_prompt(heading, text), JSONflag=True, limiter=limiter)
     return summary
 
+def build_batch_summary_prompt(items: List[Tuple[str, str]]) -> List[Dict[str, str]]:
+    sections = "\n".join(json.dumps({"id": str(i), "heading": heading, "text": text})
+                         for i, (heading, text) in enumerate(items, 1))
+    prompt = f"""
+            # Input
+            The following are {len(items)} short sections from an employee benefits booklet, one JSON object per line:
+            {sections}
+
+            # Task
+            For EACH section:
+            1. Summarize the text in 30 words or less, preserving proper nouns.
+            2. Assign exactly one classification, the best fit from: Plan Membership Rules, Benefit Provisions, Procedural Information, Contractual Obligations, Definitions, Financial Information, Timeline Information, Contact Information, Other.
+            3. Extract key entities (benefits, dates or periods, amounts or percentages, roles, companies).
+            4. Correct any spelling issues in the heading.
+            If a section is too short or vague to classify confidently, use "Other".
+
+            # Output
+            Return a JSON array with one object per section, using the section's id:""" + """
+            [
+              {
+                "id": "1",
+                "heading": "Corrected heading",
+                "summary": "Summary (30 words or less)",
+                "classification": "One of the categories above",
+                "key_entities": ["List", "of", "entities"]
+              }
+            ]
+            """
+    return [{"role": "system", "content": prompt}]
+
+async def asummarize_batch(items: List[Tuple[str, str]],
+                           limiter: Optional[RateLimiter] = None) -> List[Optional[Dict[str, Any]]]:
+    """
+    Summarize several (heading, text) sections in one request. Returns one
+    summary dict per item, in order; None for any item the response did not
+    cover so the caller can fall back to summarize_text for it.
+    """
+    prompt = build_batch_summary_prompt(items)
+    output = await acallGPT(prompt, limiter=limiter)
+    try:
+        parsed = parse_json_output(output, prompt) if output is not None else []
+    except (ValueError, SyntaxError) as e:
+        log.warning("Could not parse batch summary output: %s", e)
+        parsed = []
+
+    by_id = {}
+    if isinstance(parsed, list):
+        for entry in parsed:
+            if isinstance(entry, dict) and "summary" in entry and "classification" in entry:
+                by_id[str(entry.get("id"))] = entry
+
+    results = []
+    for i, (heading, _) in enumerate(items, 1):
+        entry = by_id.get(str(i))
+        if entry is None:
+            results.append(None)
+            continue
+        results.append({
+            "heading": entry.get("heading") or heading,
+            "summary": entry["summary"],
+            "classification": entry["classification"],
+            "key_entities": entry.get("key_entities", []),
+        })
+    return results
+
+@contextlib.contextmanager
+def replacing(filename: str, mode: str = "w"):
+    """
+    Open a uniquely named file beside `filename` for writing; on a clean
+    exit it is flushed to disk and swapped in, otherwise removed. Readers
+    (and live mappings of the old file) never see a half-written file, and
+    concurrent writers each replace it whole.
+    """
+    fd, tmp_filename = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)),
+                                        prefix=os.path.basename(filename) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        os.remove(tmp_filename)
+        raise
+
 def save_cache(data: Dict[str, Any], filename: str) -> None:
-    """Helper function to save data to a JSON cache file."""
-    with open(filename, 'w') as f:
+    """Save data to a JSON cache file, swapped in whole (see replacing)."""
+    with replacing(filename) as f:
         json.dump(data, f, indent=2)
 
 def load_cache(filename: str) -> Optional[Dict[str, Any]]:
-    """Helper function to load data from a JSON cache file."""
-    if os.path.exists(filename):
+    """Load data from a JSON cache file; None if it is missing or unreadable."""
+    if not os.path.exists(filename):
+        return None
+    try:
         with open(filename, 'r') as f:
             return json.load(f)
+    except (OSError, ValueError) as e:
+        log.warning("Ignoring unreadable cache %s: %s", filename, e)
+        return None
+
+# Mapped cache layout (little-endian):
+#   magic "BKLT" | u16 version | u16 reserved | u32 header length
+#   header: UTF-8 JSON {"meta": {...}, "fields": [...], "sections": [...]} with every
+#           provision field except the MAPPED_FIELDS
+#   offset table: one (u64 offset, u32 length) per section per mapped field
+#   blobs: body as raw UTF-8, other mapped fields as JSON
+CACHE_MAGIC = b"BKLT"
+CACHE_VERSION = 1
+CACHE_PREAMBLE = struct.Struct("<4sHHI")
+CACHE_OFFSET = struct.Struct("<QI")
+CACHE_NONE = 0xFFFFFFFF  # Blob length meaning the field was None
+MAPPED_FIELDS = ("body", "key_entities")
+
+class MappedBookletCache:
+    """
+    Read side of the mapped cache. Only the header (headings, breadcrumbs,
+    attributes, summaries) is decoded on open; mapped fields are sliced out of
+    the memory map and decoded per record on request.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, header_length = CACHE_PREAMBLE.unpack_from(self._map, 0)
+        if magic != CACHE_MAGIC or version != CACHE_VERSION:
+            raise ValueError(f"{filename} is not a version {CACHE_VERSION} booklet cache")
+
+        start = CACHE_PREAMBLE.size
+        header = json.loads(self._map[start:start + header_length].decode("utf-8"))
+        self.meta = header["meta"]
+        self.fields = header["fields"]
+        self.sections = header["sections"]
+        self.count = len(self.sections)
+        self._table = start + header_length
+
+    def __len__(self) -> int:
+        return self.count
+
+    def read_field(self, record: int, field: str) -> Any:
+        slot = record * len(self.fields) + self.fields.index(field)
+        offset, length = CACHE_OFFSET.unpack_from(self._map, self._table + slot * CACHE_OFFSET.size)
+        if length == CACHE_NONE:
+            return None
+        raw = self._map[offset:offset + length].decode("utf-8")
+        return raw if field == "body" else json.loads(raw)
+
+def save_mapped_cache(data: Dict[str, Any], filename: str) -> None:
+    """Write {"provisions": [...], ...} in the mapped cache layout."""
+    provisions = data["provisions"]
+    header = {
+        "meta": {k: v for k, v in data.items() if k != "provisions"},
+        "fields": list(MAPPED_FIELDS),
+        "sections": [{k: v for k, v in p.items() if k not in MAPPED_FIELDS} for p in provisions],
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+    blobs = []
+    for provision in provisions:
+        for field in MAPPED_FIELDS:
+            value = provision.get(field)
+            if value is None:
+                blobs.append(None)
+            else:
+                blobs.append((value if field == "body" else json.dumps(value)).encode("utf-8"))
+
+    offset = CACHE_PREAMBLE.size + len(header_bytes) + CACHE_OFFSET.size * len(blobs)
+    table = bytearray()
+    for blob in blobs:
+        if blob is None:
+            table += CACHE_OFFSET.pack(0, CACHE_NONE)
+        else:
+            table += CACHE_OFFSET.pack(offset, len(blob))
+            offset += len(blob)
+
+    # Swapped in whole, so a live mapping of the old file stays valid
+    with replacing(filename, "wb") as f:
+        f.write(CACHE_PREAMBLE.pack(CACHE_MAGIC, CACHE_VERSION, 0, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(table)
+        for blob in blobs:
+            if blob is not None:
+                f.write(blob)
+
+def load_mapped_cache(filename: str) -> Optional[MappedBookletCache]:
+    if os.path.exists(filename):
+        return MappedBookletCache(filename)
     return None
 
 def line_has_one_style(line):
@@ -879,23 +1791,268 @@ def style_matches(style1, style2):
     return style1[0] == style2[0] and style1[1] == style2[1] and style1[2] == style2[2] and style1[3] == style2[3]
 
 
+# Worker mode: one long-lived process answering line-delimited JSON requests
+#   request:  {"id": any, "op": str, "out": results dir, "params": {...}}
+#   response: {"id": any, "ok": true, "result": ...} | {"id": any, "ok": false, "error": {"type", "message"}}
+# Requests run concurrently, so responses can come back out of order; match them by id.
+
+QUERY_OPS = ("get_mini_booklet", "get_full_booklet", "get_section_context", "get_sub_sections", "get_booklet_outline")
+
+class BookletWorker:
+    """
+    Serves ingest and query requests, keeping up to `capacity` parsed
+    booklets warm (least recently used evicted first). Up to `max_in_flight`
+    requests run at once; concurrent first requests for one booklet share a
+    single load, and ingests of one results directory are serialized.
+
+    A worker outlives any fixed token total, so it lifts the process-wide
+    cap on TOKENS; instead each ingest is charged to a scope of its own
+    with a budget of `token_limit`.
+    """
+
+    def __init__(self, max_in_flight: int = 4, capacity: int = 16, workers: int = 1, cache_format: str = "json",
+                 token_limit: Optional[int] = TOKEN_LIMIT):
+        self.capacity = capacity
+        self.workers = workers  # Default page-decoding processes for ingests
+        self.cache_format = cache_format  # Default cache format for new ingests
+        self.token_limit = token_limit  # Tokens one ingest may spend (None = unlimited)
+        TOKENS.limit = None
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_in_flight)
+        self.hits = 0
+        self.misses = 0
+        self._booklets: "OrderedDict[str, BenefitsBooklet]" = OrderedDict()
+        self._loading: Dict[str, concurrent.futures.Future] = {}
+        self._ingest_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._ingests = 0
+        self._lock = threading.Lock()
+
+    def remember(self, key: str, book: "BenefitsBooklet") -> None:
+        with self._lock:
+            self._booklets[key] = book
+            self._booklets.move_to_end(key)
+            while len(self._booklets) > self.capacity:
+                self._booklets.popitem(last=False)
+
+    def booklet(self, results_dir: str) -> "BenefitsBooklet":
+        """The warm booklet for a results directory, opened read-only from whichever cache it has on first use."""
+        key = os.path.abspath(results_dir)
+        with self._lock:
+            book = self._booklets.get(key)
+            if book is not None:
+                self._booklets.move_to_end(key)
+                self.hits += 1
+                return book
+            self.misses += 1
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                future = self._loading[key] = concurrent.futures.Future()
+
+        if owner:
+            try:
+                if os.path.exists(os.path.join(key, "booklet_cache.bkc")):
+                    cache_format = "mmap"
+                elif os.path.exists(os.path.join(key, "booklet_cache.json")):
+                    cache_format = "json"
+                else:
+                    raise FileNotFoundError(f"No booklet cache in {results_dir}; ingest it first")
+                book = BenefitsBooklet.open_cache(key, cache_format=cache_format)
+            except BaseException as e:
+                future.set_exception(e)
+                with self._lock:
+                    self._loading.pop(key, None)
+                raise
+            with self._lock:
+                self._loading.pop(key, None)
+            self.remember(key, book)
+            future.set_result(book)
+        return future.result()
+
+    def ingest(self, results_dir: str, pdf: str, summarize: bool = False, workers: Optional[int] = None,
+               cache_format: Optional[str] = None, token_budget: Optional[int] = None,
+               tenant: Optional[str] = None) -> Dict[str, Any]:
+        """Parse (or load from cache) a booklet and keep it warm, replacing any older copy."""
+        key = os.path.abspath(results_dir)
+        with self._lock:
+            self._ingests += 1
+            scope = f"ingest:{self._ingests}"
+        TOKENS.set_budget(scope, self.token_limit)
+        try:
+            with self._ingest_locks[key], token_scope(scope):
+                os.makedirs(key, exist_ok=True)
+                book = BenefitsBooklet(pdf_path=pdf, results_dir=key, workers=workers or self.workers,
+                                       summarize=summarize, cache_format=cache_format or self.cache_format,
+                                       token_budget=token_budget, tenant=tenant)
+                self.remember(key, book)
+        finally:
+            TOKENS.set_budget(scope, None)
+            TOKENS.reset(scope)
+        return {"sections": len(book.sections), "cache": book.get_cache_filename()}
+
+    def evict(self, results_dir: str) -> bool:
+        with self._lock:
+            return self._booklets.pop(os.path.abspath(results_dir), None) is not None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "resident": len(self._booklets),
+                    "capacity": self.capacity}
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one request and build its response; never raises."""
+        request_id = request.get("id")
+        op = request.get("op")
+        with TELEMETRY.span("worker_request", op=op) as span:
+            try:
+                params = request.get("params") or {}
+                if op == "ingest":
+                    result = self.ingest(request["out"], **params)
+                elif op in QUERY_OPS:
+                    result = getattr(self.booklet(request["out"]), op)(**params)
+                elif op == "evict":
+                    result = self.evict(request["out"])
+                elif op == "stats":
+                    result = self.stats()
+                else:
+                    raise ValueError(f"Unknown op {op!r}")
+            except Exception as e:
+                log.warning("Worker request %s (%s) failed: %s", request_id, op, e)
+                span.set(ok=False)
+                return error_response(request_id, e)
+            span.set(ok=True)
+        return {"id": request_id, "ok": True, "result": result}
+
+    def submit(self, request: Dict[str, Any], respond) -> concurrent.futures.Future:
+        future = self.executor.submit(self.handle, request)
+        future.add_done_callback(lambda done: respond(done.result()))
+        return future
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+def error_response(request_id, error: Exception) -> Dict[str, Any]:
+    return {"id": request_id, "ok": False, "error": {"type": type(error).__name__, "message": str(error)}}
+
+def serve_stream(worker: BookletWorker, rfile, wfile) -> bool:
+    """
+    Answer requests read from rfile on wfile until EOF or a "shutdown"
+    request, then wait for those still in flight. Returns True on shutdown.
+    """
+    write_lock = threading.Lock()
+    in_flight = set()
+
+    def respond(response):
+        line = json.dumps(response, default=str)
+        with write_lock:
+            wfile.write(line + "\n")
+            wfile.flush()
+
+    def finished(future):
+        with write_lock:
+            in_flight.discard(future)
+
+    shutdown = False
+    for line in rfile:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+        except ValueError as e:
+            respond(error_response(None, e))
+            continue
+        if request.get("op") == "shutdown":
+            shutdown = True
+            break
+        future = worker.submit(request, respond)
+        with write_lock:
+            in_flight.add(future)
+        future.add_done_callback(finished)
+
+    with write_lock:
+        pending = list(in_flight)
+    concurrent.futures.wait(pending)
+    if shutdown:
+        respond({"id": request.get("id"), "ok": True, "result": None})
+    return shutdown
+
+def serve_stdio(worker: BookletWorker) -> None:
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr  # Stray prints must not interleave with protocol lines
+    log.info("Booklet worker ready on stdin/stdout")
+    try:
+        serve_stream(worker, sys.stdin, protocol_out)
+    finally:
+        sys.stdout = protocol_out
+        worker.close()
+
+def serve_socket(worker: BookletWorker, path: str) -> None:
+    """Serve every connection to the Unix socket at `path` from the same worker until one sends shutdown."""
+    import io
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            rfile = io.TextIOWrapper(self.rfile, encoding="utf-8")
+            wfile = io.TextIOWrapper(self.wfile, encoding="utf-8", write_through=True)
+            if serve_stream(worker, rfile, wfile):
+                self.server.shutdown()
+
+    if os.path.exists(path):
+        os.remove(path)
+    server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    server.daemon_threads = True
+    log.info("Booklet worker listening on %s", path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(path)
+        worker.close()
+
+
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--pdf", required=True)
-    parser.add_argument("--out", required=True)  # directory to write booklet_cache.json
+    parser.add_argument("--pdf")
+    parser.add_argument("--out")  # directory to write booklet_cache.json
     parser.add_argument("--summarize", action="store_true")
+    parser.add_argument("--workers", type=int, default=1)  # processes used to decode PDF pages
+    parser.add_argument("--cache-format", choices=["json", "mmap"], default="json")
+    parser.add_argument("--token-budget", type=int)  # Max input + output tokens for this booklet
+    parser.add_argument("--telemetry")  # JSON-lines file for stage spans and LLM counters
+    parser.add_argument("--log-level")  # DEBUG, INFO, WARNING...; defaults to BOOKLET_LOG_LEVEL or INFO
+    parser.add_argument("--serve", action="store_true")  # Worker mode: JSON lines on stdin/stdout (or --socket)
+    parser.add_argument("--socket")  # Unix socket path to serve on instead of stdin/stdout
+    parser.add_argument("--max-in-flight", type=int, default=4)  # Worker requests run at once
+    parser.add_argument("--warm", type=int, default=16)  # Booklets the worker keeps loaded
     args = parser.parse_args()
+    if not args.serve and not (args.pdf and args.out):
+        parser.error("--pdf and --out are required unless --serve is given")
+
+    configure_logging(args.log_level)
 
-    # Load API key from src/server/.env for parity with TS
-    load_dotenv(os.path.join("src", "server", ".env"))
+    if args.telemetry:
+        TELEMETRY.add_exporter(JsonLinesExporter(args.telemetry))
 
-    # TODO: call your existing load_or_process(pdf=args.pdf, out=args.out, summarize=args.summarize)
-    # and write JSON to f"{args.out}/booklet_cache.json"
-    #
-    # Pseudocode:
-    # result = BenefitsBookletPY(pdf_path=args.pdf, results_dir=args.out, summarize=args.summarize).run()
-    # with open(os.path.join(args.out, "booklet_cache.json"), "w") as f:
-    #     json.dump(result, f, indent=2)
+    # Load API key from src/server/.env for parity with TS (read when the first LLM call needs it)
+    add_env_file(os.path.join("src", "server", ".env"))
+
+    if args.serve:
+        worker = BookletWorker(max_in_flight=args.max_in_flight, capacity=args.warm,
+                               workers=args.workers, cache_format=args.cache_format)
+        if args.socket:
+            serve_socket(worker, args.socket)
+        else:
+            serve_stdio(worker)
+        return
+
+    os.makedirs(args.out, exist_ok=True)
+    try:
+        BenefitsBooklet(pdf_path=args.pdf, results_dir=args.out, workers=args.workers,
+                        summarize=args.summarize, cache_format=args.cache_format, token_budget=args.token_budget)
+    except TokenBudgetExceeded as e:
+        sys.exit(f"{e}. Finished summaries are checkpointed; rerun with a larger budget to resume.")
 
 if __name__ == "__main__":
     main()
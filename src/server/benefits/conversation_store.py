@@ -0,0 +1,481 @@
+"""
+Conversation stores behind storyagent.AgentMemory.
+
+    AGENT_MEMORY=memory   per-process, in memory (default)
+    AGENT_MEMORY=sqlite   a local SQLite file (AGENT_MEMORY_DB) in WAL mode, shared by
+                          every worker process on the host and kept across restarts
+
+A store holds one history per player, each capped to its latest
+AGENT_MEMORY_MESSAGES messages, and drops players idle for more than
+AGENT_MEMORY_TTL seconds. Every store provides:
+
+    history(player_id) -> Sequence   live, read-only view of the history (oldest first)
+    extend(player_id, msgs) -> Sequence
+    replace(player_id, msgs)
+    count(player_id) -> int          messages ever appended through extend()
+    clear(player_id)
+    stats() -> dict
+    close()
+"""
+import os
+import time
+import atexit
+import sqlite3
+import itertools
+import threading
+from collections import OrderedDict, deque
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, List, Optional
+from log import get_logger
+
+log = get_logger("conversation_store")
+
+MEMORY_MESSAGES = int(os.getenv("AGENT_MEMORY_MESSAGES", "100"))  # Latest messages kept per player
+MEMORY_TTL = float(os.getenv("AGENT_MEMORY_TTL", "3600"))  # Seconds a player may idle before being dropped
+MEMORY_BYTES = int(os.getenv("AGENT_MEMORY_BYTES", str(256 * 1024 * 1024)))  # In-memory ceiling across all players
+MESSAGE_OVERHEAD = 300  # Approximate bytes per stored message beyond its content (dict, keys, str headers)
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "conversations.db")
+
+
+def message_size(msg: Dict[str, str]) -> int:
+    """Approximate resident bytes of one stored message."""
+    return MESSAGE_OVERHEAD + len(msg.get("content") or "")
+
+
+class HistoryView(Sequence):
+    """
+    Read-only view of one player's in-memory history, oldest first, without
+    copying it up front. It is live, like a StoredHistoryView: each read
+    looks the player up again, so it follows later appends and trims, and
+    a player with no history yet (or one dropped and started over) shows
+    the messages added since. Every read holds the store's lock, so it never
+    races a concurrent turn for the same player; iteration walks a snapshot
+    taken under it. Slices and `view + list` return new lists (for prompts
+    and responses).
+    """
+
+    __slots__ = ("_store", "_player_id")
+
+    def __init__(self, store: "InMemoryStore", player_id: str) -> None:
+        self._store = store
+        self._player_id = player_id
+
+    def _messages(self):
+        # Caller holds the store's lock; reading does not count as activity
+        convo = self._store._convos.get(self._player_id)
+        return convo.messages if convo is not None else ()
+
+    def __len__(self) -> int:
+        with self._store._lock:
+            return len(self._messages())
+
+    def __getitem__(self, index):
+        with self._store._lock:
+            messages = self._messages()
+            if isinstance(index, slice):
+                start, stop, step = index.indices(len(messages))
+                if step == 1:
+                    return list(itertools.islice(messages, start, max(start, stop)))
+                return [messages[i] for i in range(start, stop, step)]
+            return messages[index]
+
+    def __iter__(self):
+        return iter(self.copy())
+
+    def __add__(self, other) -> List[Dict[str, str]]:
+        return self.copy() + list(other)
+
+    def __radd__(self, other) -> List[Dict[str, str]]:
+        return list(other) + self.copy()
+
+    def copy(self) -> List[Dict[str, str]]:
+        with self._store._lock:
+            return list(self._messages())
+
+    def __repr__(self) -> str:
+        return f"HistoryView({self._player_id!r})"
+
+
+class _Conversation:
+    __slots__ = ("messages", "count", "size", "last_used")
+
+    def __init__(self, max_messages: int) -> None:
+        self.messages: deque = deque(maxlen=max_messages)
+        self.count = 0  # Messages ever appended (replace() does not count)
+        self.size = 0  # Sum of message_size over messages
+        self.last_used = 0.0
+
+
+class InMemoryStore:
+    """
+    Histories in deques, players in least-recently-active order. Once the
+    store holds more than `max_bytes` (approximate) the least recently
+    active players are dropped until it fits. Appends are O(1) and reads
+    return HistoryViews over the live deques, guarded by the store's lock.
+    """
+
+    def __init__(self, max_messages: int = MEMORY_MESSAGES, ttl: Optional[float] = MEMORY_TTL,
+                 max_bytes: Optional[int] = MEMORY_BYTES, clock=time.monotonic) -> None:
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.bytes = 0
+        self.evicted_idle = 0
+        self.evicted_memory = 0
+        self._convos: "OrderedDict[str, _Conversation]" = OrderedDict()  # Least recently active first
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        if self.ttl is None:
+            return
+        while self._convos:
+            player_id, convo = next(iter(self._convos.items()))
+            if now - convo.last_used <= self.ttl:
+                break
+            self._drop(player_id)
+            self.evicted_idle += 1
+
+    def _drop(self, player_id: str) -> None:
+        convo = self._convos.pop(player_id, None)
+        if convo is not None:
+            self.bytes -= convo.size
+
+    def _touch(self, player_id: str, create: bool) -> Optional[_Conversation]:
+        now = self.clock()
+        self._expire(now)
+        convo = self._convos.get(player_id)
+        if convo is None:
+            if not create:
+                return None
+            convo = self._convos[player_id] = _Conversation(self.max_messages)
+        else:
+            self._convos.move_to_end(player_id)
+        convo.last_used = now
+        return convo
+
+    def _add(self, convo: _Conversation, msg: Dict[str, str]) -> None:
+        messages = convo.messages
+        size = message_size(msg)
+        if len(messages) == messages.maxlen:
+            size -= message_size(messages[0])
+        messages.append(msg)
+        convo.size += size
+        self.bytes += size
+
+    def _enforce_ceiling(self) -> None:
+        # The player just written to is the most recent, so it is only dropped when it is alone
+        while self.max_bytes is not None and self.bytes > self.max_bytes and len(self._convos) > 1:
+            self._drop(next(iter(self._convos)))
+            self.evicted_memory += 1
+
+    def history(self, player_id: str) -> HistoryView:
+        with self._lock:
+            self._touch(player_id, create=False)
+            return HistoryView(self, player_id)
+
+    def replace(self, player_id: str, msgs: Iterable[Dict[str, str]]) -> None:
+        with self._lock:
+            convo = self._touch(player_id, create=True)
+            self.bytes -= convo.size
+            convo.messages.clear()
+            convo.size = 0
+            for msg in msgs:
+                self._add(convo, msg)
+            self._enforce_ceiling()
+
+    def extend(self, player_id: str, msgs: Iterable[Dict[str, str]]) -> HistoryView:
+        with self._lock:
+            convo = self._touch(player_id, create=True)
+            for msg in msgs:
+                self._add(convo, msg)
+                convo.count += 1
+            self._enforce_ceiling()
+            return HistoryView(self, player_id)
+
+    def count(self, player_id: str) -> int:
+        with self._lock:
+            convo = self._convos.get(player_id)
+            return convo.count if convo is not None else 0
+
+    def clear(self, player_id: str) -> None:
+        with self._lock:
+            self._drop(player_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._expire(self.clock())
+            return {
+                "players": len(self._convos),
+                "messages": sum(len(c.messages) for c in self._convos.values()),
+                "bytes": self.bytes,
+                "evicted_idle": self.evicted_idle,
+                "evicted_memory": self.evicted_memory,
+            }
+
+    def close(self) -> None:
+        pass
+
+
+class StoredHistoryView(Sequence):
+    """
+    Live view of one player's history in a SqliteStore. Nothing is loaded up
+    front: each access reads just the rows it needs, so `view[-12:]` is one
+    indexed query for 12 rows. Iterating or `view + list` loads it all.
+    """
+
+    __slots__ = ("_store", "_player_id")
+
+    def __init__(self, store: "SqliteStore", player_id: str) -> None:
+        self._store = store
+        self._player_id = player_id
+
+    def __len__(self) -> int:
+        return self._store.length(self._player_id)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step in (None, 1) and index.stop is None and index.start is not None and index.start < 0:
+                return self._store.recent(self._player_id, -index.start)  # The common "last N turns"
+            start, stop, step = index.indices(len(self))
+            rows = self._store.rows(self._player_id, start, max(start, stop))
+            return rows if step == 1 else rows[::step]
+        length = len(self)
+        position = index + length if index < 0 else index
+        if not 0 <= position < length:
+            raise IndexError("history index out of range")
+        return self._store.rows(self._player_id, position, position + 1)[0]
+
+    def __iter__(self):
+        return iter(self.copy())
+
+    def __add__(self, other) -> List[Dict[str, str]]:
+        return self.copy() + list(other)
+
+    def __radd__(self, other) -> List[Dict[str, str]]:
+        return list(other) + self.copy()
+
+    def copy(self) -> List[Dict[str, str]]:
+        return self._store.rows(self._player_id, 0, None)
+
+    def __repr__(self) -> str:
+        return f"StoredHistoryView({self._player_id!r})"
+
+
+class SqliteStore:
+    """
+    {role, content} histories in a local SQLite database in WAL mode, so
+    several processes can share them. Writes are queued and committed in
+    batches, one transaction per `flush_interval` seconds or `batch_size`
+    queued operations, by a background thread; reading a player with queued
+    writes flushes first, so a process always sees its own writes. Messages
+    are indexed by (player, insertion order), and reads fetch only the rows
+    asked for. A player's idle time counts from their last write.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS players (
+            player_id TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0,
+            last_used REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY,
+            player_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS messages_by_player ON messages (player_id, id);
+        CREATE INDEX IF NOT EXISTS players_by_last_used ON players (last_used);
+    """
+
+    def __init__(self, path: str = DEFAULT_DB, max_messages: int = MEMORY_MESSAGES, ttl: Optional[float] = MEMORY_TTL,
+                 flush_interval: float = 0.05, batch_size: int = 256, expire_interval: float = 60.0, clock=time.time) -> None:
+        self.path = path
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.expire_interval = expire_interval
+        self.clock = clock  # Wall clock: last_used is compared across processes
+        self.flushes = 0
+        self._db = self._connect()  # Writes, from one flush at a time
+        self._db.executescript(self.SCHEMA)
+        self._reader = self._connect()  # Reads; under WAL they do not wait for a flush in progress
+        self._pending: List[tuple] = []  # (op, player_id, messages, timestamp)
+        self._pending_players = set()
+        self._flushing_players = set()  # In the batch being committed right now
+        self._last_expire = 0.0
+        self._lock = threading.Lock()  # Guards the queue; held briefly
+        self._write_lock = threading.Lock()  # Held for a whole flush
+        self._read_lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, name="sqlite-store-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _enqueue(self, op: str, player_id: str, msgs: List[Dict[str, str]]) -> None:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("SqliteStore is closed")
+            self._pending.append((op, player_id, msgs, self.clock()))
+            self._pending_players.add(player_id)
+            if len(self._pending) >= self.batch_size:
+                self._wake.notify()
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                self._wake.wait(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                log.warning("Conversation store flush failed; retrying: %s", e)
+
+    def flush(self) -> None:
+        """Commit every queued write in one transaction."""
+        with self._write_lock:
+            now = self.clock()
+            expire = self.ttl is not None and now - self._last_expire >= self.expire_interval
+            with self._lock:
+                if not self._pending and not expire:
+                    return
+                batch, self._pending = self._pending, []
+                touched, self._pending_players = self._pending_players, set()
+                self._flushing_players = touched
+            try:
+                self._commit(batch, touched, now if expire else None)
+            except BaseException:
+                with self._lock:
+                    self._pending[:0] = batch  # Keep the writes for the next attempt
+                    self._pending_players |= touched
+                raise
+            finally:
+                with self._lock:
+                    self._flushing_players = set()
+            if expire:
+                self._last_expire = now
+            self.flushes += 1
+
+    def _commit(self, batch: List[tuple], touched: set, expire_at: Optional[float]) -> None:
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for op, player_id, msgs, timestamp in batch:
+                if op == "clear":
+                    db.execute("DELETE FROM messages WHERE player_id = ?", (player_id,))
+                    db.execute("DELETE FROM players WHERE player_id = ?", (player_id,))
+                    continue
+                if op == "replace":
+                    db.execute("DELETE FROM messages WHERE player_id = ?", (player_id,))
+                db.executemany("INSERT INTO messages (player_id, role, content) VALUES (?, ?, ?)",
+                               [(player_id, msg.get("role", ""), msg.get("content") or "") for msg in msgs])
+                db.execute("INSERT INTO players (player_id, count, last_used) VALUES (?, ?, ?) "
+                           "ON CONFLICT (player_id) DO UPDATE SET count = count + excluded.count, "
+                           "last_used = excluded.last_used",
+                           (player_id, len(msgs) if op == "extend" else 0, timestamp))
+            for player_id in touched:
+                # Keep the latest max_messages rows
+                db.execute("DELETE FROM messages WHERE player_id = ? AND id <= (SELECT id FROM messages "
+                           "WHERE player_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                           (player_id, player_id, self.max_messages))
+            if expire_at is not None:
+                cutoff = expire_at - self.ttl
+                db.execute("DELETE FROM messages WHERE player_id IN "
+                           "(SELECT player_id FROM players WHERE last_used < ?)", (cutoff,))
+                db.execute("DELETE FROM players WHERE last_used < ?", (cutoff,))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _read(self, player_id: str, sql: str, params: tuple) -> List[tuple]:
+        with self._lock:
+            unflushed = player_id in self._pending_players or player_id in self._flushing_players
+        if unflushed:
+            self.flush()  # Waits out a flush in progress, then commits this player's queued writes
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def length(self, player_id: str) -> int:
+        return self._read(player_id, "SELECT COUNT(*) FROM messages WHERE player_id = ?", (player_id,))[0][0]
+
+    def rows(self, player_id: str, start: int, stop: Optional[int]) -> List[Dict[str, str]]:
+        """Messages [start, stop) of the history, oldest first."""
+        limit = -1 if stop is None else max(0, stop - start)
+        rows = self._read(player_id, "SELECT role, content FROM messages WHERE player_id = ? "
+                                     "ORDER BY id LIMIT ? OFFSET ?", (player_id, limit, start))
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def recent(self, player_id: str, n: int) -> List[Dict[str, str]]:
+        """The latest n messages, oldest first."""
+        rows = self._read(player_id, "SELECT role, content FROM messages WHERE player_id = ? "
+                                     "ORDER BY id DESC LIMIT ?", (player_id, n))
+        return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+    def history(self, player_id: str) -> StoredHistoryView:
+        return StoredHistoryView(self, player_id)
+
+    def extend(self, player_id: str, msgs: Iterable[Dict[str, str]]) -> StoredHistoryView:
+        self._enqueue("extend", player_id, list(msgs))
+        return StoredHistoryView(self, player_id)
+
+    def replace(self, player_id: str, msgs: Iterable[Dict[str, str]]) -> None:
+        self._enqueue("replace", player_id, list(msgs)[-self.max_messages:])
+
+    def count(self, player_id: str) -> int:
+        rows = self._read(player_id, "SELECT count FROM players WHERE player_id = ?", (player_id,))
+        return rows[0][0] if rows else 0
+
+    def clear(self, player_id: str) -> None:
+        self._enqueue("clear", player_id, [])
+
+    def stats(self) -> Dict[str, Any]:
+        self.flush()
+        with self._read_lock:
+            players, = self._reader.execute("SELECT COUNT(*) FROM players").fetchone()
+            messages, = self._reader.execute("SELECT COUNT(*) FROM messages").fetchone()
+        return {"players": players, "messages": messages, "flushes": self.flushes, "path": self.path}
+
+    def close(self) -> None:
+        """Flush queued writes and close the connections (also run at exit)."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wake.notify()
+        self._flusher.join()
+        self.flush()
+        self._db.close()
+        self._reader.close()
+        atexit.unregister(self.close)
+
+
+_sqlite_stores: Dict[str, SqliteStore] = {}
+_sqlite_lock = threading.Lock()
+
+def store_from_env():
+    """
+    A store per AGENT_MEMORY: a fresh in-memory store, or the process-wide
+    SqliteStore for AGENT_MEMORY_DB (one connection and flusher per file).
+    """
+    mode = os.getenv("AGENT_MEMORY", "memory").lower()
+    if mode == "memory":
+        return InMemoryStore()
+    if mode == "sqlite":
+        path = os.path.abspath(os.getenv("AGENT_MEMORY_DB", DEFAULT_DB))
+        with _sqlite_lock:
+            store = _sqlite_stores.get(path)
+            if store is None or store._closed:
+                store = _sqlite_stores[path] = SqliteStore(path)
+            return store
+    raise ValueError(f"Unknown AGENT_MEMORY {mode!r} (expected memory or sqlite)")
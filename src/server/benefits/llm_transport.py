@@ -0,0 +1,318 @@
+"""
+Pluggable transport for chat completions, shared by utils.callGPT/acallGPT and
+storyagent._llm/_llm_json.
+
+    LLM_TRANSPORT=live     talk to OpenAI (default)
+    LLM_TRANSPORT=record   talk to OpenAI and append every exchange to LLM_RECORDINGS
+    LLM_TRANSPORT=replay   serve responses from LLM_RECORDINGS, no network at all
+
+Every transport also streams: stream()/astream() take the same request and
+yield the reply's text deltas as they arrive.
+
+Recordings are JSON lines keyed by a hash of the full request (model,
+messages, temperature, response_format). Replay can add synthetic latency
+(LLM_REPLAY_LATENCY seconds, plus up to LLM_REPLAY_JITTER more) so concurrency
+and throughput can be load-tested offline.
+
+Nothing heavy is imported here: the OpenAI SDK and python-dotenv load when
+the first live transport is built or used, so processes that never call the
+LLM (e.g. a booklet cache hit) never pay for them.
+"""
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import weakref
+import threading
+import importlib.util
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+DEFAULT_RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_recordings.jsonl")
+ENV_FILES: List[Optional[str]] = [None]  # .env files read before the first transport; None = nearest one upward
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "256"))  # Per client: concurrent requests to the API
+MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "64"))  # Idle connections kept open for reuse
+KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))  # Seconds an idle connection stays open
+REQUEST_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))  # Seconds per request (connecting: at most 10)
+
+
+class ReplayMiss(LookupError):
+    """A replayed request has no recorded response."""
+
+class MissingAPIKey(RuntimeError):
+    """A live transport was used without an OpenAI API key."""
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def response_to_dict(response) -> Dict[str, Any]:
+    usage = getattr(response, "usage", None)
+    return {
+        "content": response.choices[0].message.content,
+        "usage": {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+        if usage is not None else None,
+    }
+
+def streamed_response(content: str):
+    """A stream's deltas joined back into a response (no usage: streams don't report it by default)."""
+    return response_from_dict({"content": content, "usage": None})
+
+def response_from_dict(data: Dict[str, Any]):
+    """Rebuild the parts of a ChatCompletion the callers read (choices[0].message.content, usage)."""
+    message = SimpleNamespace(content=data["content"])
+    usage = SimpleNamespace(**data["usage"]) if data.get("usage") else None
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+class LiveTransport:
+    """
+    OpenAI chat completions. Clients are created on first use, not at import,
+    over connection pools sized by LLM_MAX_CONNECTIONS / LLM_MAX_KEEPALIVE
+    with keep-alive. There is one async client per event loop, shared by
+    every coroutine on it: pooled connections cannot move between loops.
+    """
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncOpenAI
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """An API key is configured and the SDK is installed."""
+        return bool(self.api_key or os.getenv("OPENAI_API_KEY")) and importlib.util.find_spec("openai") is not None
+
+    def client_options(self) -> Dict[str, Any]:
+        api_key = self.api_key or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise MissingAPIKey("OPENAI_API_KEY not set: add it to the environment or a .env file, "
+                                "or use LLM_TRANSPORT=replay")
+        import httpx
+        return {
+            "api_key": api_key,
+            "timeout": httpx.Timeout(REQUEST_TIMEOUT, connect=min(REQUEST_TIMEOUT, 10.0)),
+        }
+
+    def pool_limits(self):
+        import httpx
+        return httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE,
+                            keepalive_expiry=KEEPALIVE_EXPIRY)
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                options = self.client_options()  # A missing key is reported before the SDK loads
+                from openai import OpenAI, DefaultHttpxClient
+                self._client = OpenAI(**options, http_client=DefaultHttpxClient(limits=self.pool_limits()))
+            return self._client
+
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                options = self.client_options()
+                from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+                client = self._async_clients[loop] = AsyncOpenAI(
+                    **options, http_client=DefaultAsyncHttpxClient(limits=self.pool_limits()))
+            return client
+
+    def complete(self, **request):
+        return self.client().chat.completions.create(**request)
+
+    async def acomplete(self, **request):
+        return await self.async_client().chat.completions.create(**request)
+
+    def stream(self, **request) -> Iterator[str]:
+        # Leaving the with block (also on an early close) drops the HTTP response, which ends generation
+        with self.client().chat.completions.create(**request, stream=True) as chunks:
+            for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    async def astream(self, **request) -> AsyncIterator[str]:
+        async with await self.async_client().chat.completions.create(**request, stream=True) as chunks:
+            async for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    async def aclose(self) -> None:
+        """
+        Close the running loop's async client and its pooled connections:
+        on app shutdown, or at the end of an asyncio.run() (see closing_clients).
+        """
+        with self._lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+
+class RecordingTransport:
+    """Forward to another transport and append each request/response pair to a recordings file."""
+
+    def __init__(self, inner, path: str = DEFAULT_RECORDINGS):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return self.inner.available
+
+    def record(self, request: Dict[str, Any], response) -> None:
+        line = json.dumps({"key": request_key(request), "request": request,
+                           "response": response_to_dict(response)}, ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def complete(self, **request):
+        response = self.inner.complete(**request)
+        self.record(request, response)
+        return response
+
+    async def acomplete(self, **request):
+        response = await self.inner.acomplete(**request)
+        self.record(request, response)
+        return response
+
+    # Streams are recorded under the same key as the non-streamed request, once they finish
+    def stream(self, **request) -> Iterator[str]:
+        parts = []
+        for delta in self.inner.stream(**request):
+            parts.append(delta)
+            yield delta
+        self.record(request, streamed_response("".join(parts)))
+
+    async def astream(self, **request) -> AsyncIterator[str]:
+        parts = []
+        async for delta in self.inner.astream(**request):
+            parts.append(delta)
+            yield delta
+        self.record(request, streamed_response("".join(parts)))
+
+    async def aclose(self) -> None:
+        aclose = getattr(self.inner, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+class ReplayTransport:
+    """
+    Serve recorded responses by request hash. Each call waits latency seconds
+    plus a uniform [0, jitter) extra, drawn from a seeded RNG so runs repeat.
+    The last recording for a key wins; unknown requests raise ReplayMiss.
+    Streams wait the same delay before the first delta, then yield the
+    recorded reply word by word.
+    """
+
+    available = True
+
+    def __init__(self, path: str = DEFAULT_RECORDINGS, latency: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._responses: Dict[str, Dict[str, Any]] = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._responses[entry["key"]] = entry["response"]
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def delay(self) -> float:
+        return self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def lookup(self, request: Dict[str, Any]):
+        data = self._responses.get(request_key(request))
+        if data is None:
+            raise ReplayMiss(f"No recorded response for request {request_key(request)[:12]}")
+        return response_from_dict(data)
+
+    def complete(self, **request):
+        delay = self.delay()
+        if delay:
+            time.sleep(delay)
+        return self.lookup(request)
+
+    async def acomplete(self, **request):
+        delay = self.delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return self.lookup(request)
+
+    @staticmethod
+    def deltas(response) -> List[str]:
+        return re.findall(r"\s*\S+", response.choices[0].message.content or "")
+
+    def stream(self, **request) -> Iterator[str]:
+        yield from self.deltas(self.complete(**request))
+
+    async def astream(self, **request) -> AsyncIterator[str]:
+        for delta in self.deltas(await self.acomplete(**request)):
+            yield delta
+
+
+_transport = None
+_transport_lock = threading.Lock()
+_env_loaded = False
+
+def add_env_file(path: str) -> None:
+    """Have load_env() read `path` too (values already set, in the process or earlier files, win)."""
+    ENV_FILES.insert(0, path)
+
+def load_env() -> None:
+    """Read ENV_FILES into os.environ, once."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        for path in ENV_FILES:
+            load_dotenv(path)
+        _env_loaded = True
+
+def transport_from_env():
+    load_env()
+    mode = os.getenv("LLM_TRANSPORT", "live").lower()
+    path = os.getenv("LLM_RECORDINGS", DEFAULT_RECORDINGS)
+    if mode == "live":
+        return LiveTransport()
+    if mode == "record":
+        return RecordingTransport(LiveTransport(), path)
+    if mode == "replay":
+        return ReplayTransport(path, latency=float(os.getenv("LLM_REPLAY_LATENCY", "0")),
+                               jitter=float(os.getenv("LLM_REPLAY_JITTER", "0")))
+    raise ValueError(f"Unknown LLM_TRANSPORT {mode!r} (expected live, record or replay)")
+
+def get_transport():
+    """The process-wide transport, built from the environment on first use."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = transport_from_env()
+        return _transport
+
+async def closing_clients(awaitable):
+    """
+    Await `awaitable`, then close the async client the transport opened on
+    this event loop. Wrap the coroutine given to asyncio.run() in it: that
+    loop ends with the run, and its pooled connections would otherwise wait
+    for garbage collection.
+    """
+    try:
+        return await awaitable
+    finally:
+        aclose = getattr(get_transport(), "aclose", None)  # Only live transports hold clients
+        if aclose is not None:
+            await aclose()
+
+def set_transport(transport) -> None:
+    global _transport
+    with _transport_lock:
+        _transport = transport
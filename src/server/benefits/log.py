@@ -0,0 +1,85 @@
+"""
+Logging for the benefits pipeline (stdlib logging under the "benefits" logger).
+
+    log = get_logger(__name__)
+    log.info("Parsed %d provisions", count)      # formatted only if INFO is enabled
+    debug = log.isEnabledFor(logging.DEBUG)     # hoist out of hot loops, then
+    if debug:                                   # the quiet path does no work at all
+        log.debug("Skipping header line: %.50s", line_text)
+
+Importing a module only creates its logger: "benefits" carries a
+NullHandler and propagates, so a host application (e.g. uvicorn) routes and
+filters its records with its own logging config. Entry points (booklet.py's
+CLI and worker, the benchmarks) call configure_logging() to send records to
+stderr, keeping stdout free for program output. The level comes from
+BOOKLET_LOG_LEVEL (default INFO) or its argument. Records at WARNING and
+below are rate-limited per message template there, so per-line messages
+cannot flood a pipe even at DEBUG.
+"""
+import os
+import time
+import logging
+import threading
+
+ROOT_LOGGER = "benefits"
+_configured = False
+_configure_lock = threading.Lock()
+
+logging.getLogger(ROOT_LOGGER).addHandler(logging.NullHandler())
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Pass at most `rate` records per message template every `per` seconds.
+    Records above `level` always pass. The first record let through after
+    a window with drops says how many were suppressed.
+    """
+
+    def __init__(self, rate: int = 20, per: float = 1.0, level: int = logging.WARNING):
+        super().__init__()
+        self.rate = rate
+        self.per = per
+        self.level = level
+        self._windows = {}  # (logger name, msg template) -> [window start, passed, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.level:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.per:
+                suppressed = window[2] if window else 0
+                window = self._windows[key] = [now, 0, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} [{suppressed} similar messages suppressed]"
+            if window[1] >= self.rate:
+                window[2] += 1
+                return False
+            window[1] += 1
+            return True
+
+
+def configure_logging(level=None) -> None:
+    """
+    For entry points: install the stderr handler (once) and set the level;
+    `level` overrides BOOKLET_LOG_LEVEL. Records still propagate.
+    """
+    global _configured
+    with _configure_lock:
+        logger = logging.getLogger(ROOT_LOGGER)
+        if not _configured:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+            handler.addFilter(RateLimitFilter())
+            logger.addHandler(handler)
+            _configured = True
+            level = level or os.getenv("BOOKLET_LOG_LEVEL", "INFO")
+        if level:
+            logger.setLevel(level.upper() if isinstance(level, str) else level)
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
@@ -2,9 +2,21 @@
 from __future__ import annotations
 
 import os
+import re
+import sys
+import copy
 import json
+import time
+import asyncio
+import hashlib
 import pathlib
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from pydantic import BaseModel
 from dotenv import load_dotenv
@@ -16,17 +28,24 @@ ROOT = pathlib.Path(".").resolve()
 SERVER_ENV = ROOT / "src" / "server" / ".env"
 load_dotenv(SERVER_ENV)  # keeps parity with your TS services
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+BENEFITS_DIR = ROOT / "src" / "server" / "benefits"
+if str(BENEFITS_DIR) not in sys.path:
+    sys.path.insert(0, str(BENEFITS_DIR))
 
-try:
-    from openai import OpenAI  # Official SDK ≥ 1.0
-    _OPENAI = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
-except Exception:
-    _OPENAI = None
+from llm_transport import get_transport  # live / record / replay, picked by LLM_TRANSPORT
+from conversation_store import store_from_env  # memory / sqlite, picked by AGENT_MEMORY
+from telemetry import TELEMETRY
+from log import get_logger
+
+log = get_logger("storyagent")
 
-BENEFITS_DIR = ROOT / "src" / "server" / "benefits"
-BOOKLET_CACHE = BENEFITS_DIR / "booklet_cache.json"
 RULESET_JSON = BENEFITS_DIR / "ruleset.json"
+PLANS_DIR = BENEFITS_DIR / "plans"  # One sub-directory per plan id: booklet_cache.json + ruleset.json
+DEFAULT_PLAN = "default"  # Served from BENEFITS_DIR itself
+REGISTRY_SIZE = int(os.getenv("BOOKLET_REGISTRY_SIZE", "16"))  # Plans kept resident at once
+RESPONSE_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))  # Replies kept by the response cache
+RESPONSE_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))  # Seconds a cached reply stays valid
+DISCONNECT_POLL = 0.25  # Seconds between disconnect checks while an async reply is pending
 
 # ────────────────────────────────────────────────────────────────────────────────
 # Models (request/response shapes that match your frontend)
@@ -47,35 +66,43 @@ class ScenePayload(BaseModel):
 class GuidePayload(BaseModel):
     text: str
     planHint: Optional[str] = None
+    planId: Optional[str] = None
     maxItems: int = 3
 
 # ────────────────────────────────────────────────────────────────────────────────
-# In-memory “campfire” conversation store (optional, mirrors your Node route)
+# “Campfire” conversation store (optional, mirrors your Node route)
 # ────────────────────────────────────────────────────────────────────────────────
 class AgentMemory:
-    def __init__(self) -> None:
-        self._convos: Dict[str, List[Dict[str, str]]] = {}
-        self._counts: Dict[str, int] = {}
+    """
+    Per-player conversation history over a pluggable store (see
+    conversation_store): in process memory by default, or a SQLite file that
+    several worker processes share when AGENT_MEMORY=sqlite. Reads return
+    live views, safe to iterate while other turns for the player append.
+    """
+
+    def __init__(self, store=None) -> None:
+        self.store = store or store_from_env()
 
-    def get(self, player_id: str) -> List[Dict[str, str]]:
-        return self._convos.get(player_id, []).copy()
+    def get(self, player_id: str) -> Sequence:
+        return self.store.history(player_id)
 
-    def set(self, player_id: str, history: List[Dict[str, str]]) -> None:
-        self._convos[player_id] = history
+    def set(self, player_id: str, history: Iterable[Dict[str, str]]) -> None:
+        self.store.replace(player_id, history)
 
-    def append(self, player_id: str, msg: Dict[str, str]) -> List[Dict[str, str]]:
-        h = self._convos.get(player_id, []).copy()
-        h.append(msg)
-        self._convos[player_id] = h
-        self._counts[player_id] = self._counts.get(player_id, 0) + 1
-        return h
+    def extend(self, player_id: str, msgs: Iterable[Dict[str, str]]) -> Sequence:
+        return self.store.extend(player_id, msgs)
+
+    def append(self, player_id: str, msg: Dict[str, str]) -> Sequence:
+        return self.store.extend(player_id, (msg,))
 
     def count(self, player_id: str) -> int:
-        return self._counts.get(player_id, 0)
+        return self.store.count(player_id)
 
     def clear(self, player_id: str) -> None:
-        self._convos.pop(player_id, None)
-        self._counts.pop(player_id, None)
+        self.store.clear(player_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
 
 # ────────────────────────────────────────────────────────────────────────────────
 # Utilities
@@ -89,45 +116,312 @@ def _safe_read_json(path: pathlib.Path) -> Optional[Dict[str, Any]]:
         pass
     return None
 
-def _llm(system: str, user: str, temperature: float = 0.3, model: str = "gpt-4o-mini") -> str:
-    """LLM wrapper with safe fallback when the API key is missing."""
-    if _OPENAI is None:
-        # Minimal fallback so dev doesn’t block
-        preview = user.strip().replace("\n", " ")
-        if len(preview) > 300:
-            preview = preview[:300] + "..."
-        return f"(offline) {preview}"
-    out = _OPENAI.chat.completions.create(
-        model=model,
-        temperature=temperature,
-        messages=[
+class ResponseCache:
+    """
+    LRU of LLM replies for call sites that opt in (pass cache= to _llm,
+    _llm_json or their async twins), so repeated deterministic prompts, such
+    as preset symptom buttons or scripted scenes, skip the API.
+
+    Keyed on kind (text/json), system prompt, normalized user prompt, model
+    and temperature. At most `capacity` replies are kept (least recently
+    used evicted first), each for `ttl` seconds. Offline previews and empty
+    replies are never cached. Thread-safe; share one across agents.
+    """
+
+    def __init__(self, capacity: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL) -> None:
+        self.capacity = capacity
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._replies: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()  # key -> (expires, reply)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(user: str) -> str:
+        """Unicode-normalized with runs of whitespace collapsed, so cosmetic differences share an entry."""
+        return " ".join(unicodedata.normalize("NFKC", user).split())
+
+    def key(self, kind: str, system: str, user: str, temperature: float, model: str) -> str:
+        payload = json.dumps([kind, system, self.normalize(user), model, temperature], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._replies.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._replies[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._replies.move_to_end(key)
+                self.hits += 1
+        if entry is None:
+            TELEMETRY.count("llm_cache_misses")
+            return None
+        TELEMETRY.count("llm_cache_hits")
+        return copy.deepcopy(entry[1])  # JSON replies are dicts; callers may mutate them
+
+    def put(self, key: str, reply: Any) -> None:
+        if not reply:
+            return
+        with self._lock:
+            self._replies[key] = (time.monotonic() + self.ttl, copy.deepcopy(reply))
+            self._replies.move_to_end(key)
+            while len(self._replies) > self.capacity:
+                self._replies.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._replies.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._replies),
+                "capacity": self.capacity,
+            }
+
+RESPONSES = ResponseCache()  # Shared by every StoryAgent in the process
+
+def _offline_reply(user: str) -> str:
+    # Minimal fallback so dev doesn’t block
+    preview = user.strip().replace("\n", " ")
+    if len(preview) > 300:
+        preview = preview[:300] + "..."
+    return f"(offline) {preview}"
+
+def _chat_request(system: str, user: str, temperature: float, model: str) -> Dict[str, Any]:
+    return {
+        "model": model,
+        "temperature": temperature,
+        "messages": [
             {"role": "system", "content": system},
             {"role": "user", "content": user},
         ],
-    )
-    return out.choices[0].message.content or ""
+    }
 
-def _llm_json(system: str, user: str, temperature: float = 0.2, model: str = "gpt-4o-mini") -> Dict[str, Any]:
+def _json_request(system: str, user: str, temperature: float, model: str) -> Dict[str, Any]:
     """
-    Ask for JSON only. NOTE: messages must literally contain the word “json”
+    NOTE: messages must literally contain the word “json”
     when using response_format: {type: "json_object"} with the new SDK.
     """
-    if _OPENAI is None:
-        return {}
-    out = _OPENAI.chat.completions.create(
-        model=model,
-        temperature=temperature,
-        response_format={"type": "json_object"},
-        messages=[
+    return {
+        "model": model,
+        "temperature": temperature,
+        "response_format": {"type": "json_object"},
+        "messages": [
             {"role": "system", "content": system + "\n(Respond with a single JSON object.)"},
             {"role": "user", "content": "JSON task:\n" + user},
         ],
-    )
+    }
+
+def _json_content(out) -> Dict[str, Any]:
     try:
         return json.loads(out.choices[0].message.content or "{}")
     except Exception:
         return {}
 
+def _llm(system: str, user: str, temperature: float = 0.3, model: str = "gpt-4o-mini",
+         cache: Optional[ResponseCache] = None) -> str:
+    """LLM wrapper with safe fallback when the API key is missing; `cache` opts the call into reply caching."""
+    transport = get_transport()
+    if not transport.available:
+        return _offline_reply(user)
+    key = cache.key("text", system, user, temperature, model) if cache is not None else None
+    if key is not None and (reply := cache.get(key)) is not None:
+        return reply
+    out = transport.complete(**_chat_request(system, user, temperature, model))
+    reply = out.choices[0].message.content or ""
+    if key is not None:
+        cache.put(key, reply)
+    return reply
+
+async def _allm(system: str, user: str, temperature: float = 0.3, model: str = "gpt-4o-mini",
+                cache: Optional[ResponseCache] = None) -> str:
+    """_llm on the transport's shared async client; the event loop stays free during the call."""
+    transport = get_transport()
+    if not transport.available:
+        return _offline_reply(user)
+    key = cache.key("text", system, user, temperature, model) if cache is not None else None
+    if key is not None and (reply := cache.get(key)) is not None:
+        return reply
+    out = await transport.acomplete(**_chat_request(system, user, temperature, model))
+    reply = out.choices[0].message.content or ""
+    if key is not None:
+        cache.put(key, reply)
+    return reply
+
+def _llm_json(system: str, user: str, temperature: float = 0.2, model: str = "gpt-4o-mini",
+              cache: Optional[ResponseCache] = None) -> Dict[str, Any]:
+    """Ask for JSON only ({} when offline or unparseable)."""
+    transport = get_transport()
+    if not transport.available:
+        return {}
+    key = cache.key("json", system, user, temperature, model) if cache is not None else None
+    if key is not None and (data := cache.get(key)) is not None:
+        return data
+    data = _json_content(transport.complete(**_json_request(system, user, temperature, model)))
+    if key is not None:
+        cache.put(key, data)
+    return data
+
+async def _allm_json(system: str, user: str, temperature: float = 0.2, model: str = "gpt-4o-mini",
+                     cache: Optional[ResponseCache] = None) -> Dict[str, Any]:
+    transport = get_transport()
+    if not transport.available:
+        return {}
+    key = cache.key("json", system, user, temperature, model) if cache is not None else None
+    if key is not None and (data := cache.get(key)) is not None:
+        return data
+    data = _json_content(await transport.acomplete(**_json_request(system, user, temperature, model)))
+    if key is not None:
+        cache.put(key, data)
+    return data
+
+def _llm_stream(system: str, user: str, temperature: float = 0.3, model: str = "gpt-4o-mini") -> Iterator[str]:
+    """_llm, yielding text deltas as they arrive (the offline preview comes as one delta)."""
+    transport = get_transport()
+    if not transport.available:
+        yield _offline_reply(user)
+        return
+    yield from transport.stream(**_chat_request(system, user, temperature, model))
+
+async def _allm_stream(system: str, user: str, temperature: float = 0.3, model: str = "gpt-4o-mini") -> AsyncIterator[str]:
+    transport = get_transport()
+    if not transport.available:
+        yield _offline_reply(user)
+        return
+    deltas = transport.astream(**_chat_request(system, user, temperature, model))
+    try:
+        async for delta in deltas:
+            yield delta
+    finally:
+        await deltas.aclose()  # Release the HTTP response now, not when the generator is collected
+
+class ReplyStream:
+    """
+    A reply streamed as text deltas: `for delta in stream` in sync code,
+    `async for delta in stream` in async routes (each starts its own call).
+    The finished reply is stored in AgentMemory with a single write once the
+    last delta is out; a stream closed early or failing stores nothing.
+
+    Afterwards reply and history hold what the non-streaming method would
+    return, first_token_s and latency_s the time to the first delta and to
+    the last. Both are also emitted as a telemetry span named after the call.
+    """
+
+    def __init__(self, name: str, prompt: Tuple[str, str, float, str], finish: Callable[[str], List[Dict[str, str]]]):
+        self.name = name
+        self.prompt = prompt  # system, user, temperature, model
+        self._finish = finish
+        self.reply: Optional[str] = None
+        self.history: Optional[List[Dict[str, str]]] = None
+        self.first_token_s: Optional[float] = None
+        self.latency_s: Optional[float] = None
+
+    def __iter__(self) -> Iterator[str]:
+        started, parts = time.perf_counter(), []
+        stopwatch = TELEMETRY.stopwatch(self.name, model=self.prompt[3])
+        deltas = _llm_stream(*self.prompt)
+        try:
+            for delta in deltas:
+                self._received(started, parts, delta)
+                yield delta
+            self._complete(parts)
+        finally:
+            deltas.close()
+            self._stopped(started, parts, stopwatch)
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        started, parts = time.perf_counter(), []
+        stopwatch = TELEMETRY.stopwatch(self.name, model=self.prompt[3])
+        deltas = _allm_stream(*self.prompt)
+        try:
+            async for delta in deltas:
+                self._received(started, parts, delta)
+                yield delta
+            self._complete(parts)
+        finally:
+            await deltas.aclose()
+            self._stopped(started, parts, stopwatch)
+
+    def _received(self, started: float, parts: List[str], delta: str) -> None:
+        if not parts:
+            self.first_token_s = time.perf_counter() - started
+        parts.append(delta)
+
+    def _complete(self, parts: List[str]) -> None:
+        self.reply = "".join(parts)
+        self.history = self._finish(self.reply)
+
+    def _stopped(self, started: float, parts: List[str], stopwatch) -> None:
+        self.latency_s = time.perf_counter() - started
+        stopwatch.finish(first_token_s=self.first_token_s, deltas=len(parts), completed=self.history is not None)
+        log.debug("%s: first token %s, %.3fs total, %d deltas%s", self.name,
+                  "n/a" if self.first_token_s is None else f"{self.first_token_s:.3f}s",
+                  self.latency_s, len(parts), "" if self.history is not None else " (not completed)")
+
+class PlayerDisconnected(ConnectionError):
+    """The player left before the reply was ready; the call was cancelled and nothing was stored."""
+
+async def _unless_disconnected(coro: Awaitable, disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+                               poll_interval: float = DISCONNECT_POLL):
+    """
+    Await `coro`, checking `disconnected()` (e.g. Starlette's
+    request.is_disconnected) every poll_interval seconds. When it turns
+    true, or when the caller itself is cancelled, the call is cancelled,
+    which aborts its HTTP request; a disconnect raises PlayerDisconnected.
+    """
+    if disconnected is None:
+        return await coro
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait((task,), timeout=poll_interval)
+            if done:
+                return task.result()
+            if await disconnected():
+                raise PlayerDisconnected("Player disconnected before the reply was ready")
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.wait((task,))
+
+def _guide_intro_prompt(payload: GuidePayload) -> Tuple[str, str]:
+    return (
+        "Write a short, supportive preface (max 2 sentences), no markdown.",
+        f"User: {payload.text}\nPlan hint: {payload.planHint or 'N/A'}",
+    )
+
+def _load_booklet(plan_dir: pathlib.Path):
+    """
+    Open a plan's parsed booklet from its cache, read-only: a player request
+    never parses a PDF or writes to plan data.
+    None when there is no cache or it cannot be read: the agent carries on
+    without booklet details, as it does for a missing ruleset.
+    """
+    if not (plan_dir / "booklet_cache.json").exists() and not (plan_dir / "booklet_cache.bkc").exists():
+        return None
+    from booklet import BenefitsBooklet  # Deferred: only plans with a parsed booklet need it
+    cache_format = "mmap" if (plan_dir / "booklet_cache.bkc").exists() else "json"
+    try:
+        return BenefitsBooklet.open_cache(str(plan_dir), cache_format=cache_format)
+    except Exception as e:
+        log.warning("Could not load the booklet cache in %s: %s", plan_dir, e)
+        return None
+
 def _arc_stage(turn_count: int) -> str:
     """Optional narrative arc (opening -> exploration -> closure) like your Node route."""
     if turn_count <= 3:
@@ -136,6 +430,96 @@ def _arc_stage(turn_count: int) -> str:
         return "closure"
     return "exploration"
 
+# ────────────────────────────────────────────────────────────────────────────────
+# Booklet registry (plan id -> parsed booklet + ruleset, shared LRU)
+# ────────────────────────────────────────────────────────────────────────────────
+@dataclass
+class PlanResources:
+    plan_id: str
+    booklet: Any = None  # BenefitsBooklet, or None if the plan has no parsed booklet yet
+    ruleset: Optional[Dict[str, Any]] = None
+
+class BookletRegistry:
+    """
+    Process-wide cache of plan resources keyed by plan id.
+
+    Plans are loaded on first request and at most `capacity` stay resident
+    (least recently used evicted first). Safe to share across StoryAgent
+    instances and threads; concurrent first requests for one plan share a
+    single load.
+    """
+
+    def __init__(self, capacity: int = REGISTRY_SIZE, plans_dir: pathlib.Path = PLANS_DIR) -> None:
+        self.capacity = capacity
+        self.plans_dir = plans_dir
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._plans: "OrderedDict[str, PlanResources]" = OrderedDict()
+        self._loading: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def plan_dir(self, plan_id: str) -> pathlib.Path:
+        if plan_id == DEFAULT_PLAN:
+            return BENEFITS_DIR
+        if not re.fullmatch(r"[A-Za-z0-9_-]+", plan_id):
+            raise ValueError(f"Invalid plan id: {plan_id!r}")
+        return self.plans_dir / plan_id
+
+    def load(self, plan_id: str) -> PlanResources:
+        plan_dir = self.plan_dir(plan_id)
+        ruleset_path = RULESET_JSON if plan_id == DEFAULT_PLAN else plan_dir / "ruleset.json"
+        return PlanResources(plan_id=plan_id, booklet=_load_booklet(plan_dir), ruleset=_safe_read_json(ruleset_path))
+
+    def get(self, plan_id: Optional[str] = None) -> PlanResources:
+        plan_id = plan_id or DEFAULT_PLAN
+        with self._lock:
+            plan = self._plans.get(plan_id)
+            if plan is not None:
+                self._plans.move_to_end(plan_id)
+                self.hits += 1
+                return plan
+            self.misses += 1
+            future = self._loading.get(plan_id)
+            owner = future is None
+            if owner:
+                future = self._loading[plan_id] = Future()
+
+        if owner:
+            try:
+                plan = self.load(plan_id)
+            except BaseException as e:
+                future.set_exception(e)
+                with self._lock:
+                    self._loading.pop(plan_id, None)
+                raise
+            with self._lock:
+                self._loading.pop(plan_id, None)
+                self._plans[plan_id] = plan
+                while len(self._plans) > self.capacity:
+                    self._plans.popitem(last=False)
+                    self.evictions += 1
+            future.set_result(plan)
+        return future.result()
+
+    def evict(self, plan_id: str) -> None:
+        """Drop a plan (e.g. after its booklet was re-ingested); the next get() reloads it."""
+        with self._lock:
+            if self._plans.pop(plan_id, None) is not None:
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "resident": len(self._plans),
+                "capacity": self.capacity,
+            }
+
+BOOKLETS = BookletRegistry()  # Shared by every StoryAgent in the process
+
 # ────────────────────────────────────────────────────────────────────────────────
 # Core Agent
 # ────────────────────────────────────────────────────────────────────────────────
@@ -145,12 +529,45 @@ class StoryAgent:
       - scene_response(): VN-style short reply
       - campfire_chat(): rolling conversation with convo array
       - make_benefits_guide(): Guild-of-Restoration style output
+
+    Each has an async twin (ascene_response, acampfire_chat,
+    amake_benefits_guide) for async routes; pass
+    disconnected=request.is_disconnected to cancel the LLM call when the
+    player leaves. stream_scene_response and stream_campfire_chat return a
+    ReplyStream of text deltas instead, for sync or async iteration.
+
+    Guide intros are served from the shared ResponseCache; scene replies
+    are too when called with cache=True (scripted scenes with canned input,
+    whose prompt does not depend on the conversation so far).
     """
 
-    def __init__(self) -> None:
+    def __init__(self, plan_id: Optional[str] = None, registry: Optional[BookletRegistry] = None,
+                 responses: Optional[ResponseCache] = None) -> None:
         self.memory = AgentMemory()
-        self.booklet_cache = _safe_read_json(BOOKLET_CACHE)
-        self.ruleset = _safe_read_json(RULESET_JSON)
+        self.plan_id = plan_id
+        self.registry = registry or BOOKLETS
+        self.responses = responses or RESPONSES
+
+    def plan(self, plan_id: Optional[str] = None) -> PlanResources:
+        """Booklet + ruleset for a plan (this agent's plan by default), loaded on first use."""
+        return self.registry.get(plan_id or self.plan_id)
+
+    @property
+    def booklet(self):
+        """This agent's plan's BenefitsBooklet (None without a usable cache); use it for section lookups."""
+        return self.plan().booklet
+
+    @property
+    def booklet_cache(self) -> Optional[Dict[str, Any]]:
+        """The booklet in its cache-file shape ({"provisions", "hierarchical"}), built on every access."""
+        booklet = self.booklet
+        if booklet is None:
+            return None
+        return {"provisions": [section.to_dict() for section in booklet.sections], "hierarchical": booklet.hierarchical}
+
+    @property
+    def ruleset(self) -> Optional[Dict[str, Any]]:
+        return self.plan().ruleset
 
     # 1) Visual Novel scene response (short, supportive, 1–3 sentences)
     def scene_response(
@@ -158,7 +575,39 @@ class StoryAgent:
         payload: ScenePayload,
         system_hint: Optional[str] = None,
         model: str = "gpt-4o-mini",
+        cache: bool = False,
+    ) -> Tuple[str, List[Dict[str, str]]]:
+        player_id, history, sys, user = self._scene_request(payload, system_hint)
+        # Use a single call (stream_scene_response streams)
+        reply = _llm(sys, user, temperature=0.3, model=model, cache=self.responses if cache else None)
+        return reply, self._remember_turn(player_id, history, payload.conversationHistory, payload.userInput, reply)
+
+    async def ascene_response(
+        self,
+        payload: ScenePayload,
+        system_hint: Optional[str] = None,
+        model: str = "gpt-4o-mini",
+        disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        cache: bool = False,
     ) -> Tuple[str, List[Dict[str, str]]]:
+        """scene_response without blocking the event loop; see _unless_disconnected for `disconnected`."""
+        player_id, history, sys, user = self._scene_request(payload, system_hint)
+        reply = await _unless_disconnected(
+            _allm(sys, user, temperature=0.3, model=model, cache=self.responses if cache else None), disconnected)
+        return reply, self._remember_turn(player_id, history, payload.conversationHistory, payload.userInput, reply)
+
+    def stream_scene_response(
+        self,
+        payload: ScenePayload,
+        system_hint: Optional[str] = None,
+        model: str = "gpt-4o-mini",
+    ) -> ReplyStream:
+        """scene_response as a ReplyStream: text as it is generated, then .reply / .history."""
+        player_id, history, sys, user = self._scene_request(payload, system_hint)
+        return ReplyStream("scene_stream", (sys, user, 0.3, model), lambda reply: self._remember_turn(
+            player_id, history, payload.conversationHistory, payload.userInput, reply))
+
+    def _scene_request(self, payload: ScenePayload, system_hint: Optional[str]):
         player_id = payload.playerId or "anonymous"
         history = payload.conversationHistory or self.memory.get(player_id)
 
@@ -171,21 +620,18 @@ class StoryAgent:
             f"playerData={payload.playerData.dict() if payload.playerData else None}\n"
             f"userInput={payload.userInput}"
         )
-
-        # Build convo: optional short system preamble + recent turns
-        convo = history[-12:].copy()  # keep it light
-        convo.insert(0, {"role": "system", "content": sys})
-        convo.append({"role": "user", "content": user})
-
-        # Use a single call (we don’t stream here)
-        reply = _llm(sys, user, temperature=0.3, model=model)
-
-        # Update memory (return appended history in same shape the UI expects)
-        updated = history + [{"role": "user", "content": payload.userInput},
-                             {"role": "assistant", "content": reply}]
-        self.memory.set(player_id, updated)
-
-        return reply, updated
+        return player_id, history, sys, user
+
+    def _remember_turn(self, player_id: str, history: Sequence, supplied: Optional[List[Dict[str, str]]],
+                       message: str, reply: str) -> List[Dict[str, str]]:
+        """Store one user/assistant turn; return the appended history in the shape the UI expects."""
+        turn = [{"role": "user", "content": message}, {"role": "assistant", "content": reply}]
+        updated = history + turn
+        if supplied:
+            self.memory.set(player_id, updated)
+        else:
+            self.memory.extend(player_id, turn)
+        return updated
 
     # 2) Campfire-style chat that returns the updated conversation array
     def campfire_chat(
@@ -195,6 +641,35 @@ class StoryAgent:
         conversation_history: Optional[List[Dict[str, str]]] = None,
         model: str = "gpt-4o-mini",
     ) -> List[Dict[str, str]]:
+        existing, sys = self._campfire_request(player_id, conversation_history)
+        reply = _llm(sys, message, temperature=0.4, model=model)
+        return self._remember_turn(player_id, existing, conversation_history, message, reply)
+
+    async def acampfire_chat(
+        self,
+        player_id: str,
+        message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        model: str = "gpt-4o-mini",
+        disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    ) -> List[Dict[str, str]]:
+        existing, sys = self._campfire_request(player_id, conversation_history)
+        reply = await _unless_disconnected(_allm(sys, message, temperature=0.4, model=model), disconnected)
+        return self._remember_turn(player_id, existing, conversation_history, message, reply)
+
+    def stream_campfire_chat(
+        self,
+        player_id: str,
+        message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        model: str = "gpt-4o-mini",
+    ) -> ReplyStream:
+        """campfire_chat as a ReplyStream; .history is the updated conversation once it ends."""
+        existing, sys = self._campfire_request(player_id, conversation_history)
+        return ReplyStream("campfire_stream", (sys, message, 0.4, model), lambda reply: self._remember_turn(
+            player_id, existing, conversation_history, message, reply))
+
+    def _campfire_request(self, player_id: str, conversation_history: Optional[List[Dict[str, str]]]):
         existing = conversation_history or self.memory.get(player_id)
         turn_count = len([m for m in existing if m.get("role") == "user"]) + 1
         stage = _arc_stage(turn_count)
@@ -204,23 +679,26 @@ class StoryAgent:
             "Keep responses under ~120 words, grounded and practical. "
             f"Arc stage: {stage}."
         )
-        convo = [{"role": "system", "content": sys}] + existing + [{"role": "user", "content": message}]
-        reply = _llm(sys, message, temperature=0.4, model=model)
-
-        updated = existing + [{"role": "user", "content": message},
-                              {"role": "assistant", "content": reply}]
-        self.memory.set(player_id, updated)
-        return updated
+        return existing, sys
 
     # 3) Benefits guide (Guild-of-Restoration shape)
     def make_benefits_guide(self, payload: GuidePayload) -> Dict[str, Any]:
-        # If you want to actually inject plan details, peek at self.ruleset / self.booklet_cache here.
-        intro = _llm(
-            "Write a short, supportive preface (max 2 sentences), no markdown.",
-            f"User: {payload.text}\nPlan hint: {payload.planHint or 'N/A'}",
-            temperature=0.2,
-        ).strip()
+        # If you want to actually inject plan details, peek at plan.ruleset / plan.booklet here.
+        plan = self.plan(payload.planId)
+        intro = _llm(*_guide_intro_prompt(payload), temperature=0.2, cache=self.responses).strip()
+        return self._build_guide(payload, plan, intro)
 
+    async def amake_benefits_guide(
+        self,
+        payload: GuidePayload,
+        disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    ) -> Dict[str, Any]:
+        plan = await asyncio.to_thread(self.plan, payload.planId)  # A cold plan is read from disk
+        intro = await _unless_disconnected(
+            _allm(*_guide_intro_prompt(payload), temperature=0.2, cache=self.responses), disconnected)
+        return self._build_guide(payload, plan, intro.strip())
+
+    def _build_guide(self, payload: GuidePayload, plan: PlanResources, intro: str) -> Dict[str, Any]:
         # Basic items; swap with a ruleset-driven matcher if desired.
         benefits = [
             {
@@ -251,7 +729,7 @@ class StoryAgent:
 
         # Example: simple enrichment from ruleset terms (totally optional)
         txt = payload.text.lower()
-        if self.ruleset and ("massage" in txt or "muscle" in txt or "back" in txt):
+        if plan.ruleset and ("massage" in txt or "muscle" in txt or "back" in txt):
             benefits.append({
                 "priority": len(benefits) + 1,
                 "title": "Registered Massage Therapy",
@@ -272,7 +750,7 @@ class StoryAgent:
                 "phone": "1-800-361-6212"
             },
             "sourceArtifacts": {
-                "booklet_cache": bool(self.booklet_cache),
-                "ruleset": bool(self.ruleset),
+                "booklet_cache": bool(plan.booklet and plan.booklet.sections),
+                "ruleset": bool(plan.ruleset),
             }
         }
@@ -0,0 +1,191 @@
+"""
+Spans and counters for the booklet pipeline.
+
+    with TELEMETRY.span("style_list", pages=len(pages)) as span:
+        ...
+        span.set(styles=len(style_list))
+
+    @TELEMETRY.traced("cache_save")
+    def save(self): ...
+
+    TELEMETRY.count("llm_retries")
+
+Every finished span and counter increment is handed to each registered
+exporter as a plain dict:
+
+    {"type": "span", "name", "span_id", "parent_id", "start", "duration", "attrs"}
+    {"type": "counter", "name", "value", "attrs"}
+
+Span nesting follows contextvars, so it is correct across asyncio tasks.
+Spans opened in worker threads start a new root. With no exporters
+registered, spans still time their block but nothing is built or written.
+Set BOOKLET_TELEMETRY=path.jsonl to export to a JSON-lines file.
+"""
+import os
+import json
+import time
+import inspect
+import functools
+import itertools
+import threading
+import contextvars
+from typing import Any, Dict, List, Optional
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class JsonLinesExporter:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class InMemoryExporter:
+    """Keeps every record; handy in tests and benchmarks."""
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def export(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    def spans(self, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [r for r in self.records if r["type"] == "span" and (name is None or r["name"] == name)]
+
+    def counter(self, name: str) -> float:
+        return sum(r["value"] for r in self.records if r["type"] == "counter" and r["name"] == name)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.records.clear()
+
+
+class Span:
+    def __init__(self, telemetry: "Telemetry", name: str, attrs: Dict[str, Any]):
+        self.telemetry = telemetry
+        self.name = name
+        self.attrs = attrs
+        self.span_id = next(telemetry._ids)
+        self.parent_id = None
+        self.start = 0.0
+        self.duration = 0.0
+        self._token = None
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        parent = _current_span.get()
+        self.parent_id = parent.span_id if parent is not None else None
+        self._token = _current_span.set(self)
+        self.start = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.duration = time.perf_counter() - self._started
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.telemetry.emit_span(self)
+
+
+class Stopwatch:
+    """
+    A span whose time accumulates between resume() and pause(), for work
+    done inside a generator: time spent by the consumer between yields is
+    not counted. finish() emits it.
+    """
+
+    def __init__(self, telemetry: "Telemetry", name: str, attrs: Dict[str, Any]):
+        self.span = Span(telemetry, name, attrs)
+        self.span.parent_id = getattr(_current_span.get(), "span_id", None)
+        self.span.start = time.time()
+        self._resumed = None
+
+    def resume(self) -> None:
+        self._resumed = time.perf_counter()
+
+    def pause(self) -> None:
+        if self._resumed is not None:
+            self.span.duration += time.perf_counter() - self._resumed
+            self._resumed = None
+
+    def finish(self, **attrs) -> None:
+        self.pause()
+        self.span.set(**attrs)
+        self.span.telemetry.emit_span(self.span)
+
+
+class Telemetry:
+    def __init__(self):
+        self.exporters: List[Any] = []
+        self._ids = itertools.count(1)
+
+    def add_exporter(self, exporter) -> None:
+        self.exporters.append(exporter)
+
+    def remove_exporter(self, exporter) -> None:
+        self.exporters.remove(exporter)
+
+    def span(self, name: str, **attrs) -> Span:
+        return Span(self, name, attrs)
+
+    def traced(self, name: str):
+        """Decorator: run every call of the function inside a span (attributes via annotate())."""
+        def decorator(fn):
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(name):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def annotate(self, **attrs) -> None:
+        """Set attributes on the innermost open span, if any."""
+        span = _current_span.get()
+        if span is not None:
+            span.set(**attrs)
+
+    def stopwatch(self, name: str, **attrs) -> Stopwatch:
+        stopwatch = Stopwatch(self, name, attrs)
+        stopwatch.resume()
+        return stopwatch
+
+    def count(self, name: str, value: float = 1, **attrs) -> None:
+        if self.exporters:
+            self.export({"type": "counter", "name": name, "value": value, "attrs": attrs})
+
+    def emit_span(self, span: Span) -> None:
+        if self.exporters:
+            self.export({"type": "span", "name": span.name, "span_id": span.span_id, "parent_id": span.parent_id,
+                         "start": span.start, "duration": span.duration, "attrs": span.attrs})
+
+    def export(self, record: Dict[str, Any]) -> None:
+        for exporter in self.exporters:
+            exporter.export(record)
+
+
+TELEMETRY = Telemetry()
+if os.getenv("BOOKLET_TELEMETRY"):
+    TELEMETRY.add_exporter(JsonLinesExporter(os.environ["BOOKLET_TELEMETRY"]))
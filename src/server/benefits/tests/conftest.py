@@ -0,0 +1,121 @@
+"""
+Shared fixtures. Nothing here touches the network: LLM calls go through a
+scripted transport that answers summary prompts from their own text, or
+through the replay transport over recordings of it.
+
+    python -m pytest src/server/benefits/tests
+"""
+import os
+import ast
+import re
+import sys
+import json
+import shutil
+from types import SimpleNamespace
+
+import pytest
+
+BENEFITS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BENEFITS_DIR)
+
+import llm_transport
+from llm_transport import RecordingTransport, ReplayTransport
+
+SAMPLE_CACHE = os.path.join(BENEFITS_DIR, "booklet_cache.json")
+SINGLE_PROMPT = re.compile(r"under the heading: \[(.*?)\]\n\s*Here is the text: \[(.*)\]\n\s*# Task", re.DOTALL)
+
+
+def scripted_summary(heading, text):
+    """What a perfectly consistent model answers for one section, batched or not."""
+    return {"heading": heading.strip().title(), "summary": f"{len(text.split())} words on {heading.strip()}",
+            "classification": "Other", "key_entities": sorted(set(re.findall(r"\b[A-Z][a-z]{3,}\b", text)))[:5]}
+
+
+class ScriptedTransport:
+    """
+    Answers summarize_text and batch summary prompts deterministically.
+    `fail(kind)` may return an exception to raise instead (kind is
+    "single" or "batch"). Every call is counted in calls.
+    """
+
+    available = True
+
+    def __init__(self, fail=None):
+        self.fail = fail
+        self.calls = {"single": 0, "batch": 0}
+
+    def answer(self, request):
+        prompt = ast.literal_eval(request["messages"][0]["content"])[0]["content"]  # acallGPT sends str(prompt)
+        single = SINGLE_PROMPT.search(prompt)
+        kind = "single" if single else "batch"
+        self.calls[kind] += 1
+        error = self.fail(kind) if self.fail else None
+        if error is not None:
+            raise error
+        if single:
+            content = json.dumps(scripted_summary(*single.groups()))
+        else:
+            items = [json.loads(line) for line in map(str.strip, prompt.splitlines()) if line.startswith('{"id"')]
+            content = json.dumps([dict(scripted_summary(item["heading"], item["text"]), id=item["id"])
+                                  for item in items])
+        usage = SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+    def complete(self, **request):
+        return self.answer(request)
+
+    async def acomplete(self, **request):
+        return self.answer(request)
+
+
+@pytest.fixture
+def use_transport():
+    """Install a transport for the test; the previous one is restored afterwards."""
+    previous = llm_transport._transport
+    yield llm_transport.set_transport
+    llm_transport.set_transport(previous)
+
+
+@pytest.fixture
+def recorded(tmp_path, use_transport):
+    """
+    recorded(run) runs `run()` against the scripted transport, recording
+    every exchange, then installs and returns a ReplayTransport over them.
+    """
+    def record(run, fail=None):
+        path = str(tmp_path / "recordings.jsonl")
+        use_transport(RecordingTransport(ScriptedTransport(fail), path))
+        run()
+        replay = ReplayTransport(path)
+        use_transport(replay)
+        return replay
+    return record
+
+
+@pytest.fixture
+def unsummarized_cache(tmp_path):
+    """
+    make(name) returns a results directory holding the sample booklet cache
+    with every summary cleared, ready for BenefitsBooklet(pdf_path=None, ...).
+    """
+    with open(SAMPLE_CACHE, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for provision in data["provisions"]:
+        provision.update(summary=None, classification=None, key_entities=None)
+
+    def make(name):
+        results_dir = tmp_path / name
+        results_dir.mkdir()
+        with open(results_dir / "booklet_cache.json", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        return str(results_dir)
+    return make
+
+
+@pytest.fixture
+def sample_cache(tmp_path):
+    """A results directory holding a copy of the sample booklet cache."""
+    results_dir = tmp_path / "sample"
+    results_dir.mkdir()
+    shutil.copy(SAMPLE_CACHE, results_dir / "booklet_cache.json")
+    return str(results_dir)
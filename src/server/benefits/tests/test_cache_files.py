@@ -0,0 +1,59 @@
+import json
+import os
+import threading
+
+import pytest
+
+from booklet import MappedBookletCache, replacing, save_mapped_cache
+from conftest import SAMPLE_CACHE
+
+WRITERS = 8
+SAVES = 10
+
+
+def sample_data():
+    with open(SAMPLE_CACHE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_concurrent_mapped_saves_replace_the_file_whole(tmp_path):
+    data = sample_data()
+    # Each writer saves a different number of sections; a mixed file would not read back as any of them
+    versions = [dict(data, provisions=data["provisions"][:len(data["provisions"]) - n]) for n in range(WRITERS)]
+    filename = str(tmp_path / "booklet_cache.bkc")
+    errors = []
+
+    def save(version):
+        try:
+            for _ in range(SAVES):
+                save_mapped_cache(version, filename)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(version,)) for version in versions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    cache = MappedBookletCache(filename)
+    version = next(v for v in versions if len(v["provisions"]) == len(cache))
+    assert [cache.read_field(i, "body") for i in range(len(cache))] == [p["body"] for p in version["provisions"]]
+    assert os.listdir(tmp_path) == ["booklet_cache.bkc"]
+
+
+def test_failed_write_keeps_the_old_file_and_leaves_nothing_behind(tmp_path):
+    filename = str(tmp_path / "booklet_cache.bkc")
+    save_mapped_cache(sample_data(), filename)
+    with open(filename, "rb") as f:
+        before = f.read()
+
+    with pytest.raises(OSError):
+        with replacing(filename, "wb") as f:
+            f.write(b"BKLT partial")
+            raise OSError("disk full")
+
+    with open(filename, "rb") as f:
+        assert f.read() == before
+    assert os.listdir(tmp_path) == ["booklet_cache.bkc"]
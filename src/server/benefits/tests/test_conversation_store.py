@@ -0,0 +1,88 @@
+import sys
+import threading
+
+import pytest
+
+from conversation_store import InMemoryStore, SqliteStore, message_size
+from llm_transport import LiveTransport
+from storyagent import AgentMemory, StoryAgent
+
+THREADS = 8
+TURNS = 300
+HISTORY = 400  # Long enough that reading it spans many thread switches
+
+
+@pytest.fixture
+def offline(monkeypatch, use_transport):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    use_transport(LiveTransport())
+
+
+@pytest.fixture
+def fast_switching():
+    """Switch threads far more often than usual, so unlocked reads of a shared deque collide."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_concurrent_campfire_turns_for_one_player(offline, fast_switching):
+    agent = StoryAgent()
+    agent.memory = AgentMemory(InMemoryStore(max_messages=HISTORY))
+    errors = []
+
+    def chat(thread_num):
+        try:
+            for turn in range(TURNS):
+                agent.campfire_chat("player", f"message {thread_num}.{turn}")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=chat, args=(n,)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert agent.memory.count("player") == THREADS * TURNS * 2
+    history = agent.memory.get("player")
+    assert len(history) == HISTORY and len(list(history)) == HISTORY
+    assert [m["role"] for m in history[-2:]] == ["user", "assistant"]
+
+
+def test_memory_stays_bounded_across_players():
+    messages = [{"role": "user", "content": "x" * 200}] * 10
+    max_bytes = 50 * message_size(messages[0])
+    store = InMemoryStore(max_messages=5, max_bytes=max_bytes)
+
+    for player in range(100):
+        store.extend(f"player{player}", messages)
+
+    stats = store.stats()
+    assert stats["bytes"] <= max_bytes
+    assert stats["messages"] == stats["players"] * 5
+    assert stats["evicted_memory"] == 100 - stats["players"]
+    assert store.count("player99") == 10 and len(store.history("player99")) == 5
+    assert len(store.history("player0")) == 0
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    store = InMemoryStore() if request.param == "memory" else SqliteStore(str(tmp_path / "conversations.db"))
+    yield store
+    store.close()
+
+
+def test_views_are_live_for_new_and_restarted_players(store):
+    turn = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    view = store.history("newcomer")
+    assert len(view) == 0
+
+    store.extend("newcomer", turn)
+    assert list(view) == turn and view[-1:] == turn[1:]
+
+    store.clear("newcomer")
+    store.extend("newcomer", turn[:1])
+    assert view.copy() == turn[:1]
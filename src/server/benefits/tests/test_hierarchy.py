@@ -0,0 +1,67 @@
+import copy
+import json
+import os
+import random
+
+import pytest
+
+from booklet import BenefitsBooklet, BookletSection
+
+TRIALS = 300
+STEPS = 3  # Batches of edits per trial: 900 in all
+
+
+def write_cache(results_dir, provisions, hierarchical):
+    os.makedirs(results_dir, exist_ok=True)
+    with open(os.path.join(results_dir, "booklet_cache.json"), "w", encoding="utf-8") as f:
+        json.dump({"provisions": provisions, "hierarchical": hierarchical}, f)
+    return BenefitsBooklet(pdf_path=None, results_dir=results_dir, summarize=False)
+
+
+def rebuilt(book, results_dir):
+    """The same sections with the hierarchy built from scratch."""
+    provisions = [dict(section.to_dict(), breadcrumb_heading=None) for section in book.sections]
+    return write_cache(results_dir, provisions, hierarchical=False)
+
+
+def random_edits(rnd, book, provisions, sizes):
+    kind = rnd.choice(["insert", "remove", "update", "mixed"])
+    inserted, removed, updated = [], [], []
+    if kind in ("remove", "mixed"):
+        removed = rnd.sample(book.sections, rnd.randint(1, 3))
+    if kind in ("insert", "mixed"):
+        for _ in range(rnd.randint(1, 3)):
+            provision = copy.deepcopy(rnd.choice(provisions))
+            provision.update(sequence=rnd.random() * 80, breadcrumb_heading=None)
+            provision["attributes"]["size"] = rnd.choice(sizes)
+            inserted.append(BookletSection.from_dict(provision))
+    if kind in ("update", "mixed"):
+        for section in rnd.sample([s for s in book.sections if s not in removed], 2):
+            section.attributes = dict(section.attributes, size=rnd.choice(sizes))  # Re-style: new dict
+            section.heading += rnd.choice(["", " (revised)"])
+            updated.append(section)
+    return inserted, removed, updated
+
+
+@pytest.mark.parametrize("from_cache", [True, False], ids=["hierarchical_cache", "fresh_hierarchy"])
+def test_incremental_updates_match_full_rebuild(tmp_path, sample_cache, from_cache):
+    with open(os.path.join(sample_cache, "booklet_cache.json"), encoding="utf-8") as f:
+        provisions = json.load(f)["provisions"]
+    sizes = sorted({p["attributes"]["size"] for p in provisions})
+
+    for trial in range(TRIALS // 2):
+        rnd = random.Random(trial * 2 + from_cache)
+        # A hierarchical cache recovers parents from breadcrumbs; a fresh one links them while building
+        book = write_cache(str(tmp_path / "book"), provisions if from_cache else
+                           [dict(p, breadcrumb_heading=None) for p in provisions], hierarchical=from_cache)
+        for step in range(STEPS):
+            inserted, removed, updated = random_edits(rnd, book, provisions, sizes)
+            book.update_sections(inserted=inserted, removed=removed, updated=updated, save=False)
+
+            reference = rebuilt(book, str(tmp_path / "reference"))
+            breadcrumbs = [s.breadcrumb_heading for s in reference.sections]
+            assert [s.breadcrumb_heading for s in book.sections] == breadcrumbs, (trial, step)
+            for breadcrumb in set(breadcrumbs):
+                assert book.get_section_context(breadcrumb) == reference.get_section_context(breadcrumb)
+                assert book.get_sub_sections(breadcrumb, recursive=True) == \
+                    reference.get_sub_sections(breadcrumb, recursive=True)
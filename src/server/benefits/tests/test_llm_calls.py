@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import os
+import sys
+from importlib.machinery import ModuleSpec
+from types import ModuleType, SimpleNamespace
+
+import pytest
+
+from booklet import BenefitsBooklet
+from conftest import BENEFITS_DIR, ScriptedTransport
+from llm_transport import LiveTransport, MissingAPIKey
+from utils import acallGPT, callGPT
+
+
+class BrokenTransport:
+    available = True
+
+    def complete(self, **request):
+        raise ConnectionError("socket closed")
+
+
+def test_missing_api_key_is_reported_once_without_retrying(monkeypatch, use_transport, caplog):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    use_transport(LiveTransport())
+
+    with pytest.raises(MissingAPIKey, match="OPENAI_API_KEY not set"):
+        LiveTransport().client_options()
+    with caplog.at_level(logging.WARNING):
+        assert callGPT("Summarize this", JSONflag=True) is None
+        assert asyncio.run(acallGPT("Summarize this", JSONflag=True)) is None
+
+    messages = [r.getMessage() for r in caplog.records]
+    assert sum("OPENAI_API_KEY not set" in message for message in messages) == 2
+    assert not any("attempt" in message for message in messages)
+
+
+def test_unexpected_error_before_a_response_is_retried_and_logged(use_transport, caplog):
+    use_transport(BrokenTransport())
+
+    with caplog.at_level(logging.DEBUG, logger="benefits.utils"):
+        assert callGPT("Summarize this", retries=2) is None
+
+    assert sum("Unexpected error" in r.getMessage() for r in caplog.records) == 2
+    assert any("Response:\nNone" in r.getMessage() for r in caplog.records)
+
+
+@pytest.fixture
+def fake_sdk(monkeypatch):
+    """Stand-in openai/httpx modules whose AsyncOpenAI answers like ScriptedTransport; returns (opened, live) clients."""
+    opened, live, scripted = [], set(), ScriptedTransport()
+
+    class AsyncOpenAI:
+        def __init__(self, **options):
+            async def create(**request):
+                return scripted.answer(request)
+            self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+            opened.append(self)
+            live.add(self)
+
+        async def close(self):
+            live.discard(self)
+
+    openai = ModuleType("openai")
+    openai.__spec__ = ModuleSpec("openai", None)
+    openai.AsyncOpenAI, openai.DefaultAsyncHttpxClient = AsyncOpenAI, lambda **options: None
+    openai.OpenAIError = type("OpenAIError", (Exception,), {})
+    openai.RateLimitError = type("RateLimitError", (openai.OpenAIError,), {})
+    httpx = ModuleType("httpx")
+    httpx.Timeout = httpx.Limits = lambda *args, **kwargs: None
+    monkeypatch.setitem(sys.modules, "openai", openai)
+    monkeypatch.setitem(sys.modules, "httpx", httpx)
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    return opened, live
+
+
+def test_each_ingest_closes_the_async_client_it_opened(tmp_path, use_transport, fake_sdk):
+    opened, live = fake_sdk
+    use_transport(LiveTransport())
+    pdf = os.path.join(BENEFITS_DIR, "Sample Booklet1.pdf")
+
+    for name in ("first", "second"):
+        (tmp_path / name).mkdir()
+        book = BenefitsBooklet(pdf_path=pdf, results_dir=str(tmp_path / name), summarize=True)
+        assert all(s.summary is not None for s in book.sections)
+
+    assert len(opened) == 2  # One per ingest's event loop
+    assert live == set()
@@ -0,0 +1,33 @@
+import subprocess
+import sys
+
+from conftest import BENEFITS_DIR
+
+# Runs in a fresh interpreter: importing the pipeline must leave logging to the host
+HOST = """
+import logging, sys
+sys.path.insert(0, sys.argv[1])
+records = []
+class Collect(logging.Handler):
+    def emit(self, record):
+        records.append(record.name)
+logging.basicConfig(level=logging.INFO, handlers=[Collect()])
+import storyagent, booklet, utils, log
+benefits = logging.getLogger("benefits")
+assert [type(h).__name__ for h in benefits.handlers] == ["NullHandler"], benefits.handlers
+assert benefits.propagate
+utils.log.warning("from the pipeline")
+log.configure_logging("INFO")
+log.configure_logging("INFO")
+assert [type(h).__name__ for h in benefits.handlers] == ["NullHandler", "StreamHandler"], benefits.handlers
+booklet.log.info("after configure_logging")
+print(records)
+"""
+
+
+def test_imports_leave_logging_to_the_host():
+    result = subprocess.run([sys.executable, "-c", HOST, BENEFITS_DIR], capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "['benefits.utils', 'benefits.booklet']"
+    assert "after configure_logging" in result.stderr and "from the pipeline" not in result.stderr
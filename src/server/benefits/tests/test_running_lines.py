@@ -0,0 +1,48 @@
+from booklet import detect_running_lines
+
+
+def page(number, top=(), bottom=()):
+    """A parsed page with the given (text, y) lines at its top and bottom edges."""
+    return {"number": number,
+            "initial_lines": [{"text": text, "top": y, "bottom": y + 12} for text, y in top],
+            "final_lines": [{"text": text, "top": y - 12, "bottom": y} for text, y in bottom]}
+
+
+def skipped(running_lines, edge):
+    return [[text for text, _ in lines] for lines in running_lines[edge]]
+
+
+def test_chapter_header_runs_across_rank_shifts_and_gaps():
+    # The old rule keyed on (rank, text) and only looked two pages back: with
+    # the booklet title missing from page 2 and a figure page without the
+    # header (page 4), the chapter header on pages 2 and 5 was read as a heading.
+    pages = [page(0, top=[("Plan Booklet", 20), ("Dental Benefits", 40), ("Coverage", 80)]),
+             page(1, top=[("Plan Booklet", 20), ("Dental Benefits", 40), ("Basic Services", 80)]),
+             page(2, top=[("Dental Benefits", 40), ("Major Services", 80)]),
+             page(3, top=[("Plan Booklet", 20), ("Dental Benefits", 40), ("Orthodontics", 80)]),
+             page(4, top=[("Figure 1", 60)]),
+             page(5, top=[("Dental Benefits", 40), ("Exclusions", 80)])]
+
+    running_lines, templates = detect_running_lines(pages)
+
+    assert skipped(running_lines, "header") == [[], ["Plan Booklet", "Dental Benefits"], ["Dental Benefits"],
+                                                ["Plan Booklet", "Dental Benefits"], [], ["Dental Benefits"]]
+    assert sorted(templates, key=lambda t: t["position"]) == [
+        {"edge": "header", "text": "Plan Booklet", "position": 20.0, "pages": [2, 4]},
+        {"edge": "header", "text": "Dental Benefits", "position": 40.0, "pages": [2, 3, 4, 6]}]
+
+
+def test_page_numbers_run_everywhere_but_a_far_apart_sub_heading_does_not():
+    chapters = ["Life", "Health", "Dental", "Vision", "Travel"]
+    pages = []
+    for chapter_num, chapter in enumerate(chapters):
+        for offset in range(4):
+            number = chapter_num * 4 + offset
+            top = [(f"{chapter} Benefits", 40)] + ([("Exclusions", 60)] if offset == 0 else [])
+            pages.append(page(number, top=top, bottom=[(f"Page {number + 1}", 760)]))
+
+    running_lines, templates = detect_running_lines(pages)
+
+    assert all(lines == [(f"Page {number + 1}", 760)] for number, lines in enumerate(running_lines["footer"]))
+    assert not any("Exclusions" in texts for texts in skipped(running_lines, "header"))
+    assert {t["text"] for t in templates} == {"Page"} | {f"{chapter} Benefits" for chapter in chapters}
@@ -0,0 +1,69 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from conftest import SAMPLE_CACHE
+from booklet import BenefitsBooklet
+from llm_transport import LiveTransport
+from storyagent import BookletRegistry, GuidePayload, StoryAgent
+
+
+@pytest.fixture
+def offline(monkeypatch, use_transport):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    use_transport(LiveTransport())
+
+
+def agent_for(plans_dir, plan_id):
+    return StoryAgent(plan_id=plan_id, registry=BookletRegistry(plans_dir=plans_dir))
+
+
+def test_guide_survives_a_torn_booklet_cache(tmp_path, offline):
+    plan_dir = tmp_path / "torn"
+    plan_dir.mkdir()
+    (plan_dir / "booklet_cache.json").write_text('{"provisions": [{"heading": "Dental', encoding="utf-8")
+    agent = agent_for(tmp_path, "torn")
+
+    guide = agent.make_benefits_guide(GuidePayload(text="My back hurts after work"))
+
+    assert guide["intro"].startswith("(offline)")
+    assert guide["sourceArtifacts"]["booklet_cache"] is False
+    assert agent.booklet is None and agent.booklet_cache is None
+
+
+def test_booklet_cache_keeps_its_file_shape(tmp_path, offline):
+    plan_dir = tmp_path / "sample"
+    plan_dir.mkdir()
+    shutil.copy(SAMPLE_CACHE, plan_dir / "booklet_cache.json")
+    agent = agent_for(tmp_path, "sample")
+
+    cache = agent.booklet_cache
+
+    assert cache["hierarchical"] is True
+    assert [p["heading"] for p in cache["provisions"]] == [s.heading for s in agent.booklet.sections]
+    assert agent.make_benefits_guide(GuidePayload(text="Physio?"))["sourceArtifacts"]["booklet_cache"] is True
+
+
+def snapshot(directory):
+    return {name: (directory / name).read_bytes() for name in os.listdir(directory)}
+
+
+def test_loading_a_plan_never_writes_to_it(tmp_path, offline):
+    plan_dir = tmp_path / "flat"
+    plan_dir.mkdir()
+    with open(SAMPLE_CACHE, encoding="utf-8") as f:
+        data = json.load(f)
+    for provision in data["provisions"]:
+        provision["breadcrumb_heading"] = None
+    (plan_dir / "booklet_cache.json").write_text(json.dumps({"provisions": data["provisions"],
+                                                            "hierarchical": False}), encoding="utf-8")
+    before = snapshot(plan_dir)
+
+    agent = agent_for(tmp_path, "flat")
+    mapped = BenefitsBooklet.open_cache(str(plan_dir), cache_format="mmap")  # Would migrate on a full load
+
+    assert agent.booklet.hierarchical and agent.booklet.get_booklet_outline()
+    assert [s.breadcrumb_heading for s in mapped.sections] == [s.breadcrumb_heading for s in agent.booklet.sections]
+    assert snapshot(plan_dir) == before
@@ -0,0 +1,56 @@
+import asyncio
+import os
+
+import pytest
+
+from booklet import BenefitsBooklet
+from conftest import BENEFITS_DIR, ScriptedTransport
+from utils import TOKENS, TokenBudgetExceeded
+
+SAMPLE_PDF = os.path.join(BENEFITS_DIR, "Sample Booklet1.pdf")
+
+
+def results_dir(tmp_path, name):
+    path = tmp_path / name
+    path.mkdir()
+    return str(path)
+
+
+def summaries(book):
+    return [(s.sequence, s.heading, s.body, s.summary, s.classification, s.key_entities) for s in book.sections]
+
+
+def test_streamed_ingest_matches_parse_then_summarize(tmp_path, use_transport):
+    use_transport(ScriptedTransport())
+    streamed = BenefitsBooklet(pdf_path=SAMPLE_PDF, results_dir=results_dir(tmp_path, "streamed"), summarize=True)
+    parsed = BenefitsBooklet(pdf_path=SAMPLE_PDF, results_dir=results_dir(tmp_path, "parsed"), summarize=False)
+    asyncio.run(parsed.async_summarize())
+
+    assert all(s.summary is not None for s in streamed.sections)
+    assert summaries(streamed) == summaries(parsed)
+    assert len(streamed.summary_latencies) > 0
+    assert not os.path.exists(streamed.get_checkpoint_filename())
+    assert os.path.exists(streamed.get_cache_filename())
+
+
+def test_interrupted_ingest_resumes_from_its_checkpoint(tmp_path, use_transport):
+    resumed = results_dir(tmp_path, "resumed")
+    first = ScriptedTransport()
+    use_transport(first)
+    with pytest.raises(TokenBudgetExceeded):
+        BenefitsBooklet(pdf_path=SAMPLE_PDF, results_dir=resumed, summarize=True, token_budget=2000)
+    checkpoint = os.path.join(resumed, "booklet_checkpoint.jsonl")
+    with open(checkpoint) as f:
+        done = sum(1 for _ in f)
+    assert done > 0 and sum(first.calls.values()) > 0
+
+    full, second = ScriptedTransport(), ScriptedTransport()
+    use_transport(full)
+    BenefitsBooklet(pdf_path=SAMPLE_PDF, results_dir=results_dir(tmp_path, "full"), summarize=True)
+    use_transport(second)
+    TOKENS.set_budget(f"booklet:{os.path.abspath(resumed)}", None)
+    book = BenefitsBooklet(pdf_path=SAMPLE_PDF, results_dir=resumed, summarize=True)
+
+    assert all(s.summary is not None for s in book.sections)
+    assert sum(second.calls.values()) < sum(full.calls.values())
+    assert not os.path.exists(checkpoint)
@@ -0,0 +1,64 @@
+import asyncio
+import json
+import os
+
+from booklet import BenefitsBooklet
+from llm_transport import ReplayMiss
+from conftest import ScriptedTransport
+
+
+def summarize(results_dir, **kwargs):
+    book = BenefitsBooklet(pdf_path=None, results_dir=results_dir, summarize=False)
+    records = asyncio.run(book.async_summarize(**kwargs))
+    return book, records
+
+
+def summaries(book):
+    return [(s.sequence, s.heading, s.summary, s.classification, s.key_entities) for s in book.sections]
+
+
+def test_batched_summaries_match_single_calls(recorded, unsummarized_cache):
+    replay = recorded(lambda: (summarize(unsummarized_cache("record_single"), batch=False),
+                               summarize(unsummarized_cache("record_batched"), batch=True)))
+
+    single, single_records = summarize(unsummarized_cache("single"), batch=False)
+    batched, batched_records = summarize(unsummarized_cache("batched"), batch=True)
+
+    assert len(replay) > 0
+    assert all(record["ok"] for record in single_records + batched_records)
+    assert any(record["batched"] for record in batched_records)
+    assert all(s.summary is not None for s in batched.sections)
+    assert summaries(batched) == summaries(single)
+
+
+def test_batching_sends_fewer_requests(use_transport, unsummarized_cache):
+    single, batched = ScriptedTransport(), ScriptedTransport()
+    use_transport(single)
+    summarize(unsummarized_cache("single"), batch=False)
+    use_transport(batched)
+    summarize(unsummarized_cache("batched"), batch=True)
+
+    assert single.calls["batch"] == 0
+    assert batched.calls["batch"] > 0
+    assert sum(batched.calls.values()) < single.calls["single"]
+
+
+def test_failed_batch_falls_back_to_single_calls(use_transport, unsummarized_cache):
+    transport = ScriptedTransport(fail=lambda kind: RuntimeError("batch endpoint down") if kind == "batch" else None)
+    use_transport(transport)
+    results_dir = unsummarized_cache("fallback")
+    book, records = summarize(results_dir, batch=True)
+
+    assert transport.calls["batch"] > 0
+    assert all(record["ok"] for record in records)
+    assert all(s.summary is not None for s in book.sections)
+    with open(os.path.join(results_dir, "summary_cache.json")) as f:
+        assert json.load(f)["entries"]  # Saved even though batches failed
+
+
+def test_transport_errors_do_not_abort_the_run(use_transport, unsummarized_cache):
+    use_transport(ScriptedTransport(fail=lambda kind: ReplayMiss("no recording")))
+    book, records = summarize(unsummarized_cache("failing"), batch=True)
+
+    assert records and not any(record["ok"] for record in records)
+    assert all(s.summary is None for s in book.sections)
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from booklet import BenefitsBooklet, BookletWorker
+from conftest import BENEFITS_DIR, ScriptedTransport
+from utils import TOKENS
+
+SAMPLE_PDF = os.path.join(BENEFITS_DIR, "Sample Booklet1.pdf")
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    monkeypatch.setattr(TOKENS, "limit", TOKENS.limit)  # The worker lifts the process-wide cap
+    workers = []
+
+    def make(**kwargs):
+        workers.append(BookletWorker(**kwargs))
+        return workers[-1]
+    yield make
+    for w in workers:
+        w.close()
+
+
+def query(w, results_dir, op="get_booklet_outline"):
+    return w.handle({"id": 1, "op": op, "out": results_dir})
+
+
+def test_query_loads_the_cache_format_on_disk(worker, sample_cache):
+    BenefitsBooklet(pdf_path=None, results_dir=sample_cache, summarize=False, cache_format="mmap")
+    os.remove(os.path.join(sample_cache, "booklet_cache.json"))
+
+    response = query(worker(cache_format="json"), sample_cache)
+
+    assert response["ok"], response
+    assert not os.path.exists(os.path.join(sample_cache, "booklet_cache.json"))
+
+
+def test_query_without_a_cache_is_an_error_response(worker, tmp_path):
+    response = query(worker(), str(tmp_path))
+
+    assert not response["ok"]
+    assert response["error"]["type"] == "FileNotFoundError"
+
+
+def ingest_from_scratch(w, results_dir, **params):
+    for name in ("booklet_cache.json", "summary_cache.json"):
+        if os.path.exists(os.path.join(results_dir, name)):
+            os.remove(os.path.join(results_dir, name))
+    return w.handle({"id": 1, "op": "ingest", "out": results_dir,
+                     "params": dict(pdf=SAMPLE_PDF, summarize=True, **params)})
+
+
+def test_each_ingest_is_budgeted_on_its_own(worker, tmp_path, use_transport):
+    use_transport(ScriptedTransport())
+    probe = str(tmp_path / "probe")
+    assert ingest_from_scratch(worker(), probe)["ok"]
+    spent = sum(TOKENS.usage(f"booklet:{os.path.abspath(probe)}").values())
+    assert spent > 0
+
+    # Budgets that one ingest fits in, but that a running total over repeated ingests would not
+    w = worker(token_limit=spent * 3 // 2)
+    results_dir = str(tmp_path / "reingested")
+    for _ in range(3):
+        response = ingest_from_scratch(w, results_dir, token_budget=spent * 3 // 2)
+        assert response["ok"], response
@@ -1,37 +1,126 @@
 import os
 import re
+import sys
 import ast
 import time
-from openai import OpenAI
-import openai
-import tiktoken
-import sys
-from dotenv import load_dotenv
-load_dotenv()
+import random
+import asyncio
+import threading
+import contextlib
+import contextvars
+from collections import deque
+from llm_transport import MissingAPIKey, get_transport
+from telemetry import TELEMETRY
+from log import get_logger
+
+log = get_logger("utils")
+
+encoders = {}  # model -> tiktoken encoder, loaded on first use (the first load may need a download)
 
-enc = tiktoken.encoding_for_model("gpt-3.5-turbo")
+
+class _NotRaised(Exception):
+    """Stands in for an OpenAI exception type while the SDK is not imported, when none can be raised."""
+
+def openai_error(name):
+    """openai.<name> if the SDK has been imported (by the live transport), else a type nothing raises."""
+    module = sys.modules.get("openai")
+    return getattr(module, name) if module is not None else _NotRaised
 
 
 MODEL_NAME = "gpt-4o"
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
-CUMULATIVE_TOKENS = {"input": 0, "output": 0}
-TOKEN_LIMIT = 2_000_000  # 1 million tokens
+TOKEN_LIMIT = 2_000_000  # Process-wide budget (input + output tokens)
+RATE_LIMIT_RPM = 5_000  # Requests/minute budget for async calls (gpt-4o, usage tier 2)
+RATE_LIMIT_TPM = 450_000  # Tokens/minute budget for async calls
 
 
 
-def callGPT(prompt, retries=5, delay=0, JSONflag=False, model=MODEL_NAME, temp=0, token_track=True):
-    global CUMULATIVE_TOKENS
+class TokenBudgetExceeded(RuntimeError):
+    """Raised instead of starting an LLM call once a token budget in scope is spent."""
+
+class TokenAccountant:
+    """
+    Token ledger shared by every thread and event loop in the process. Usage
+    is charged to the process-wide total and to each scope active for the
+    call (see token_scope), e.g. "booklet:<name>" or "tenant:<id>". Any total
+    or scope can carry a budget; check() rejects new calls once one is spent.
+    limit=None lifts the process-wide cap (scope budgets still apply).
+    """
+
+    def __init__(self, limit=TOKEN_LIMIT):
+        self.limit = limit
+        self.totals = {"input": 0, "output": 0}
+        self._scopes = {}  # scope -> {"input", "output"}
+        self._budgets = {}  # scope -> token limit
+        self._lock = threading.Lock()
+
+    def set_budget(self, scope, limit):
+        with self._lock:
+            if limit is None:
+                self._budgets.pop(scope, None)
+            else:
+                self._budgets[scope] = limit
+
+    def check(self, scopes=()):
+        with self._lock:
+            spent = self.totals["input"] + self.totals["output"]
+            if self.limit is not None and spent >= self.limit:
+                raise TokenBudgetExceeded(f"Token limit of {self.limit} reached ({spent} used)")
+            for scope in scopes:
+                limit = self._budgets.get(scope)
+                used = self._scopes.get(scope, {"input": 0, "output": 0})
+                if limit is not None and used["input"] + used["output"] >= limit:
+                    raise TokenBudgetExceeded(f"Token budget of {limit} for {scope} reached")
+
+    def record(self, tokens_in, tokens_out, scopes=()):
+        with self._lock:
+            self.totals["input"] += tokens_in
+            self.totals["output"] += tokens_out
+            for scope in scopes:
+                used = self._scopes.setdefault(scope, {"input": 0, "output": 0})
+                used["input"] += tokens_in
+                used["output"] += tokens_out
+
+    def usage(self, scope=None):
+        with self._lock:
+            return dict(self.totals if scope is None else self._scopes.get(scope, {"input": 0, "output": 0}))
 
-    if CUMULATIVE_TOKENS["input"] + CUMULATIVE_TOKENS["output"] > TOKEN_LIMIT:
-        print(
-            f"Token limit of {TOKEN_LIMIT} exceeded. Current total: {CUMULATIVE_TOKENS['input'] + CUMULATIVE_TOKENS['output']}")
-        print("Terminating the program.")
-        sys.exit(1)
+    def reset(self, scope=None):
+        with self._lock:
+            if scope is None:
+                self.totals["input"] = self.totals["output"] = 0
+                self._scopes.clear()
+            else:
+                self._scopes.pop(scope, None)
+
+TOKENS = TokenAccountant()
+CUMULATIVE_TOKENS = TOKENS.totals  # Kept for existing readers; updated under the accountant's lock
+_token_scopes = contextvars.ContextVar("token_scopes", default=())
+
+@contextlib.contextmanager
+def token_scope(*scopes):
+    """Charge LLM calls made inside the block (and tasks it spawns) to these scopes too."""
+    token = _token_scopes.set(_token_scopes.get() + tuple(scope for scope in scopes if scope))
+    try:
+        yield
+    finally:
+        _token_scopes.reset(token)
+
+def charge_tokens(model, tokens_in, tokens_out):
+    TOKENS.record(tokens_in, tokens_out, _token_scopes.get())
+    TELEMETRY.annotate(tokens_in=tokens_in, tokens_out=tokens_out)
+    TELEMETRY.count("llm_tokens_in", tokens_in, model=model)
+    TELEMETRY.count("llm_tokens_out", tokens_out, model=model)
+
+@TELEMETRY.traced("llm_call")
+def callGPT(prompt, retries=5, delay=0, JSONflag=False, model=MODEL_NAME, temp=0, token_track=True):
+    TELEMETRY.annotate(model=model, ok=False)
+    TOKENS.check(_token_scopes.get())
 
     attempt = 0
+    response = output = None  # Logged by the handlers below, also when the call itself failed
 
     def log_error(message, exception, attempt):
-        print(f"{message} on attempt {attempt + 1}: {exception}")
+        log.warning("%s on attempt %d: %s", message, attempt + 1, exception)
 
     while attempt < retries:
         try:
@@ -42,77 +131,189 @@ def callGPT(prompt, retries=5, delay=0, JSONflag=False, model=MODEL_NAME, temp=0
             ]
 
             if attempt > 0:
-                print(f"Retry attempt {attempt + 1} of {retries}")
+                log.info("Retry attempt %d of %d", attempt + 1, retries)
+                TELEMETRY.count("llm_retries", model=model)
 
-            response = client.chat.completions.create(
+            response = get_transport().complete(
                 model=model,
                 messages=messages,
                 temperature=temp,
             )
 
             output = response.choices[0].message.content
+            TELEMETRY.annotate(attempts=attempt + 1)
             if token_track:
-                tokens_in = len(enc.encode(str(prompt)))
-                tokens_out = len(enc.encode(str(output)))
-                CUMULATIVE_TOKENS["input"] += tokens_in
-                CUMULATIVE_TOKENS["output"] += tokens_out
-                #print(f"MODEL: {model} | TOKENS IN: {tokens_in} -> TOKENS OUT: {tokens_out}")
-                #print(f"CUMULATIVE TOKENS - IN: {CUMULATIVE_TOKENS['input']}, OUT: {CUMULATIVE_TOKENS['output']}")
+                charge_tokens(model, *usage_tokens(response, prompt, output, model))
 
             # Clean up unnecessary escape characters
             #output = output.replace("\\u2014", "—")
 
             if JSONflag:
-                # Find the first valid JSON object or array in the response
-                match = re.search(r'(\{[\s\S]*\}|\[[\s\S]*\])', output)
-
-                if match:
-                    json_str = match.group()
-                    non_json_before = output[:match.start()].strip()
-                    non_json_after = output[match.end():].strip()
-
-                    # Log any non-JSON content found before or after the JSON
-                    if len(non_json_before) > 10 or len(non_json_after) > 10:
-                        print(f"GPT deviated from JSON:")
-                        print("DEBUG THIS:")
-                        print(output)
-                        print("--------------------")
-
-                        if non_json_before:
-                            print(f"Non-JSON before: {non_json_before}")
-                        if non_json_after:
-                            print(f"Non-JSON after: {non_json_after}")
-                        print(f"JSON portion was: {json_str}")
-                        print(response.usage)
-                        print(f"The prompt was: {prompt}")
-
-                    # Evaluate the JSON content safely
-                    output = ast.literal_eval(json_str)
-                else:
-                    # If no JSON is detected, log the full output
-                    print("No JSON detected in output:")
-                    print(output)
+                output = parse_json_output(output, prompt, response.usage)
+            TELEMETRY.annotate(ok=True)
             return output
 
-        except openai.OpenAIError as e:
+        except MissingAPIKey as e:
+            log.error("%s", e)  # Retrying cannot help
+            return None
+        except openai_error("OpenAIError") as e:
             log_error("OpenAI API error", e, attempt)
         except (ValueError, SyntaxError) as e:
             log_error("Parsing error", e, attempt)
-            print(output)
+            log.debug("Unparseable output:\n%s", output)
         except Exception as e:
             log_error("Unexpected error", e, attempt)
-            print("------------------")
-            print(prompt)
-            print("------------------")
-            print(response)
-            print("------------------")
+            log.debug("Prompt:\n%s\nResponse:\n%s", prompt, response)
 
         attempt += 1
         if attempt < retries:
-            print(f"Waiting for {delay} seconds before retrying...")
+            log.info("Waiting for %s seconds before retrying...", delay)
             time.sleep(delay)
 
-    print("Maximum retries reached. Exiting.")
+    log.error("Maximum retries reached. Exiting.")
+    TELEMETRY.annotate(attempts=retries)
+    return None
+
+def count_tokens(text, model=MODEL_NAME):
+    encoder = encoders.get(model)
+    if encoder is None:
+        import tiktoken  # Deferred: only needed when a response carries no usage block
+        encoder = encoders.setdefault(model, tiktoken.encoding_for_model(model))
+    return len(encoder.encode(str(text)))
+
+def usage_tokens(response, prompt, output, model=MODEL_NAME):
+    """(tokens in, tokens out) from the response's usage block, re-encoding only when it has none."""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        return usage.prompt_tokens, usage.completion_tokens
+    return count_tokens(prompt, model), count_tokens(output, model)
+
+def parse_json_output(output, prompt, usage=None):
+    """Pull the first JSON object/array out of a completion and evaluate it."""
+    # Find the first valid JSON object or array in the response
+    match = re.search(r'(\{[\s\S]*\}|\[[\s\S]*\])', output)
+
+    if match:
+        json_str = match.group()
+        non_json_before = output[:match.start()].strip()
+        non_json_after = output[match.end():].strip()
+
+        # Log any non-JSON content found before or after the JSON
+        if len(non_json_before) > 10 or len(non_json_after) > 10:
+            log.warning("GPT deviated from JSON (%d chars before, %d after)",
+                        len(non_json_before), len(non_json_after))
+            log.debug("Output:\n%s\nJSON portion was: %s\nUsage: %s\nThe prompt was: %s",
+                      output, json_str, usage, prompt)
+
+        # Evaluate the JSON content safely
+        return ast.literal_eval(json_str)
+
+    # If no JSON is detected, log the full output
+    log.warning("No JSON detected in output")
+    log.debug("Output:\n%s", output)
+    return output
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) for rate-limit budgeting."""
+    return len(str(text)) // 4 + 1
+
+class RateLimiter:
+    """
+    Async sliding-window budget for requests-per-minute and tokens-per-minute.
+    acquire() waits until a request of the given size fits in both budgets.
+    """
+
+    def __init__(self, rpm=RATE_LIMIT_RPM, tpm=RATE_LIMIT_TPM, window=60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self._events = deque()  # (timestamp, tokens)
+        self._tokens = 0
+        self._lock = asyncio.Lock()
+
+    def _expire(self, now):
+        while self._events and now - self._events[0][0] >= self.window:
+            _, tokens = self._events.popleft()
+            self._tokens -= tokens
+
+    async def acquire(self, tokens):
+        tokens = min(tokens, self.tpm)  # An oversized request still gets through on an empty window
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._expire(now)
+                if len(self._events) < self.rpm and self._tokens + tokens <= self.tpm:
+                    self._events.append((now, tokens))
+                    self._tokens += tokens
+                    return
+                await asyncio.sleep(self._events[0][0] + self.window - now)
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=60.0):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+@TELEMETRY.traced("llm_call")
+async def acallGPT(prompt, retries=5, JSONflag=False, model=MODEL_NAME, temp=0, token_track=True,
+                   limiter=None, base_delay=1.0, max_delay=60.0):
+    """
+    Async counterpart of callGPT on the shared LLM transport. Requests go
+    through the optional RateLimiter, and rate-limit rejections are retried
+    with exponential backoff and jitter (honouring Retry-After when sent).
+    """
+    TELEMETRY.annotate(model=model, ok=False)
+    TOKENS.check(_token_scopes.get())
+
+    messages = [
+        {"role": "system", "content": str(prompt)},
+        {"role": "user",
+         "content": "Produce the requested JSON. Use double quotes for all key/value pairs. Handle special characters as regular text, without escaping them. Do not add code tags."}
+    ]
+
+    for attempt in range(retries):
+        if attempt > 0:
+            TELEMETRY.count("llm_retries", model=model)
+        try:
+            if limiter is not None:
+                await limiter.acquire(estimate_tokens(prompt))
+
+            response = await get_transport().acomplete(
+                model=model,
+                messages=messages,
+                temperature=temp,
+            )
+
+            output = response.choices[0].message.content
+            TELEMETRY.annotate(attempts=attempt + 1)
+            if token_track:
+                charge_tokens(model, *usage_tokens(response, prompt, output, model))
+
+            if JSONflag:
+                output = parse_json_output(output, prompt, response.usage)
+            TELEMETRY.annotate(ok=True)
+            return output
+
+        except MissingAPIKey as e:
+            log.error("%s", e)  # Retrying cannot help
+            return None
+        except openai_error("RateLimitError") as e:
+            retry_after = e.response.headers.get("retry-after") if e.response is not None else None
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = backoff_delay(attempt, base_delay, max_delay)
+            log.warning("Rate limited on attempt %d; backing off %.1fs", attempt + 1, delay)
+        except openai_error("OpenAIError") as e:
+            log.warning("OpenAI API error on attempt %d: %s", attempt + 1, e)
+            delay = backoff_delay(attempt, base_delay, max_delay)
+        except (ValueError, SyntaxError) as e:
+            log.warning("Parsing error on attempt %d: %s", attempt + 1, e)
+            delay = 0
+
+        if attempt + 1 < retries:
+            await asyncio.sleep(delay)
+
+    log.error("Maximum retries reached. Exiting.")
+    TELEMETRY.annotate(attempts=retries)
     return None
 
 def setup_results_directory(booklet_name):
@@ -122,7 +323,6 @@ def setup_results_directory(booklet_name):
     return results_dir
 
 def reset_token_count():
-    global CUMULATIVE_TOKENS
-    CUMULATIVE_TOKENS = {"input": 0, "output": 0}
+    TOKENS.reset()
 
 # FUTURE IMPROVEMENTS